@@ -0,0 +1,34 @@
+"""Add freshness indexes on route_geometry_cache and data_cache_meta.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+
+revision = "002"
+down_revision = "001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY avoids locking the cache tables during a rolling deploy;
+    # it cannot run inside a transaction, hence the autocommit block.
+    # IF NOT EXISTS: fresh databases already get these from create_all().
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_route_geometry_cache_fetched_at "
+            "ON route_geometry_cache (fetched_at)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_data_cache_meta_refreshed_at "
+            "ON data_cache_meta (refreshed_at)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_data_cache_meta_refreshed_at")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_route_geometry_cache_fetched_at")
@@ -0,0 +1,51 @@
+"""Split route_geometry_cache.coords_json into lats/lons float8[] columns.
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+revision = "003"
+down_revision = "002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("route_geometry_cache", sa.Column("lats", ARRAY(sa.Float()), nullable=True))
+    op.add_column("route_geometry_cache", sa.Column("lons", ARRAY(sa.Float()), nullable=True))
+    op.execute("""
+        UPDATE route_geometry_cache SET
+            lats = ARRAY(
+                SELECT (p->>0)::float8
+                FROM jsonb_array_elements(coords_json)
+                    WITH ORDINALITY AS t(p, i)
+                ORDER BY i
+            ),
+            lons = ARRAY(
+                SELECT (p->>1)::float8
+                FROM jsonb_array_elements(coords_json)
+                    WITH ORDINALITY AS t(p, i)
+                ORDER BY i
+            )
+    """)
+    op.alter_column("route_geometry_cache", "lats", nullable=False)
+    op.alter_column("route_geometry_cache", "lons", nullable=False)
+    op.drop_column("route_geometry_cache", "coords_json")
+
+
+def downgrade() -> None:
+    op.add_column("route_geometry_cache", sa.Column("coords_json", JSONB, nullable=True))
+    op.execute("""
+        UPDATE route_geometry_cache SET coords_json = (
+            SELECT COALESCE(jsonb_agg(jsonb_build_array(lats[i], lons[i]) ORDER BY i), '[]'::jsonb)
+            FROM generate_subscripts(lats, 1) AS i
+        )
+    """)
+    op.alter_column("route_geometry_cache", "coords_json", nullable=False)
+    op.drop_column("route_geometry_cache", "lons")
+    op.drop_column("route_geometry_cache", "lats")
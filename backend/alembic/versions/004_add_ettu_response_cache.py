@@ -0,0 +1,32 @@
+"""Add ettu_response_cache table.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases that already ran the app have the table from create_all()
+    if sa.inspect(op.get_bind()).has_table("ettu_response_cache"):
+        return
+    op.create_table(
+        "ettu_response_cache",
+        sa.Column("path", sa.String(100), primary_key=True),
+        sa.Column("etag", sa.String(200), nullable=True),
+        sa.Column("last_modified", sa.String(100), nullable=True),
+        sa.Column("body", sa.LargeBinary(), nullable=False),
+        sa.Column("fetched_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ettu_response_cache")
@@ -0,0 +1,22 @@
+"""ETag-aware JSON responses for rarely-changing catalog endpoints."""
+
+import hashlib
+
+from fastapi import Request, Response
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body."""
+    return '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def json_response(request: Request, body: bytes, etag: str | None = None) -> Response:
+    """Return JSON bytes with an ETag, or 304 if the client already has them."""
+    if etag is None:
+        return Response(body, media_type="application/json")
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
@@ -1,13 +1,15 @@
 """Route REST API endpoints."""
 
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.api.etag import json_response, make_etag
 from app.db.session import get_session
 from app.models.tables import Route, RouteStop, Stop
-from app.schemas.route import RouteDetail, RouteInfo, RouteStopInfo
+from app.schemas.route import RouteDetail, RouteInfo
 
 router = APIRouter(prefix="/api/routes", tags=["routes"])
 
@@ -15,26 +17,36 @@ router = APIRouter(prefix="/api/routes", tags=["routes"])
 tracker = None
 
 
-@router.get("", response_model=list[RouteInfo])
-async def list_routes(session: AsyncSession = Depends(get_session)):
+@router.get("", response_class=Response, responses={200: {"model": list[RouteInfo]}})
+async def list_routes(request: Request, session: AsyncSession = Depends(get_session)):
     """Get all tram routes with geometry."""
+    if tracker:
+        cached = tracker.get_catalog_json("routes")
+        if cached:
+            return json_response(request, cached[1], cached[0])
+        version = tracker.catalog_version
+
     result = await session.execute(select(Route).order_by(Route.number))
     routes = result.scalars().all()
-    route_infos = []
-    for r in routes:
-        geometry = None
-        stop_ids: list[int] = []
-        if tracker:
-            geometry = tracker.get_route_geometry(r.id)
-            stop_ids = tracker.get_route_stop_ids(r.id)
-        route_infos.append(RouteInfo(
-            id=r.id, number=r.number, name=r.name, color=r.color,
-            geometry=geometry, stop_ids=stop_ids,
-        ))
-    return route_infos
+    geometries = tracker.get_route_geometries_bulk([r.id for r in routes]) if tracker else {}
+    # Plain dicts in RouteInfo shape; skips per-item pydantic validation
+    route_infos = [
+        {
+            "id": r.id, "number": r.number, "name": r.name, "color": r.color,
+            "geometry": geometries.get(r.id),
+            "stop_ids": tracker.get_route_stop_ids(r.id) if tracker else [],
+        }
+        for r in routes
+    ]
+    body = orjson.dumps(route_infos)
+    if not tracker:
+        return json_response(request, body)
+    etag = make_etag(body)
+    tracker.put_catalog_json("routes", version, etag, body)
+    return json_response(request, body, etag)
 
 
-@router.get("/{route_id}", response_model=RouteDetail)
+@router.get("/{route_id}", response_class=Response, responses={200: {"model": RouteDetail}})
 async def get_route(route_id: int, session: AsyncSession = Depends(get_session)):
     """Get route detail with stops and geometry."""
     result = await session.execute(
@@ -45,26 +57,17 @@ async def get_route(route_id: int, session: AsyncSession = Depends(get_session))
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Route not found")
 
-    stops = []
-    for rs in route.stops:
-        stops.append(RouteStopInfo(
-            id=rs.stop.id,
-            name=rs.stop.name,
-            lat=rs.stop.lat,
-            lon=rs.stop.lon,
-            order=rs.order,
-            direction=rs.direction,
-        ))
+    # Plain dicts in RouteDetail shape; skips per-stop pydantic construction
+    stops = [
+        {
+            "id": rs.stop.id, "name": rs.stop.name, "lat": rs.stop.lat, "lon": rs.stop.lon,
+            "order": rs.order, "direction": rs.direction,
+        }
+        for rs in route.stops
+    ]
+    geometry = tracker.get_route_geometry(route.id) if tracker else None
 
-    geometry = None
-    if tracker:
-        geometry = tracker.get_route_geometry(route.id)
-
-    return RouteDetail(
-        id=route.id,
-        number=route.number,
-        name=route.name,
-        color=route.color,
-        stops=stops,
-        geometry=geometry,
-    )
+    return Response(orjson.dumps({
+        "id": route.id, "number": route.number, "name": route.name, "color": route.color,
+        "stops": stops, "geometry": geometry,
+    }), media_type="application/json")
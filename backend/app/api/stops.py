@@ -1,9 +1,11 @@
 """Stop REST API endpoints."""
 
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.etag import json_response, make_etag
 from app.db.session import get_session
 from app.models.tables import Stop
 from app.schemas.route import StopInfoFull
@@ -15,12 +17,31 @@ router = APIRouter(prefix="/api/stops", tags=["stops"])
 tracker = None
 
 
-@router.get("", response_model=list[StopInfoFull])
-async def list_stops(session: AsyncSession = Depends(get_session)):
+@router.get("", response_class=Response, responses={200: {"model": list[StopInfoFull]}})
+async def list_stops(request: Request, session: AsyncSession = Depends(get_session)):
     """Get all tram stops."""
-    result = await session.execute(select(Stop).order_by(Stop.name))
-    stops = result.scalars().all()
-    return [StopInfoFull(id=s.id, name=s.name, direction=s.direction, lat=s.lat, lon=s.lon) for s in stops]
+    if tracker:
+        cached = tracker.get_catalog_json("stops")
+        if cached:
+            return json_response(request, cached[1], cached[0])
+        version = tracker.catalog_version
+
+    # Only the StopInfoFull columns, as plain row tuples (no ORM identity map)
+    result = await session.stream(
+        select(Stop.id, Stop.name, Stop.direction, Stop.lat, Stop.lon)
+        .order_by(Stop.name)
+        .execution_options(yield_per=500)
+    )
+    # Plain dicts in StopInfoFull shape; skips per-item pydantic validation
+    body = orjson.dumps([
+        {"id": sid, "name": name, "direction": direction, "lat": lat, "lon": lon, "routes": []}
+        async for sid, name, direction, lat, lon in result
+    ])
+    if not tracker:
+        return json_response(request, body)
+    etag = make_etag(body)
+    tracker.put_catalog_json("stops", version, etag, body)
+    return json_response(request, body, etag)
 
 
 @router.get("/{stop_id}/arrivals", response_model=StopArrivals)
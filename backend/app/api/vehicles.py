@@ -1,6 +1,6 @@
 """Vehicle REST API endpoints."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 
 from app.schemas.vehicle import VehicleState
 
@@ -10,15 +10,13 @@ router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
 tracker = None
 
 
-@router.get("", response_model=list[VehicleState])
+@router.get("", response_class=Response, responses={200: {"model": list[VehicleState]}})
 async def list_vehicles(route: str | None = None):
     """Get all currently active vehicles."""
     if tracker is None:
-        return []
-    states = list(tracker.current_states.values())
-    if route:
-        states = [s for s in states if s.route == route]
-    return states
+        return Response(b"[]", media_type="application/json")
+    # States are validated when built; serve pre-serialized bytes without re-validation
+    return Response(tracker.get_vehicles_json(route), media_type="application/json")
 
 
 @router.get("/{vehicle_id}", response_model=VehicleState | None)
@@ -3,7 +3,6 @@
 import asyncio
 import logging
 
-import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 logger = logging.getLogger(__name__)
@@ -24,18 +23,18 @@ async def vehicle_ws(websocket: WebSocket) -> None:
         await websocket.close(code=1011, reason="Service not ready")
         return
 
-    # Send current snapshot first
-    state_data = await broadcaster.get_current_state()
-    if state_data:
-        snapshot = orjson.loads(state_data)
-        snapshot["type"] = "snapshot"
-        await websocket.send_bytes(orjson.dumps(snapshot))
+    # Take the sequence before the snapshot so no update in between is missed
+    seq = broadcaster.seq
 
-    # Subscribe to updates
-    queue = broadcaster.subscribe()
+    # Send current snapshot first (stored pre-serialized by the broadcaster)
+    snapshot = await broadcaster.get_snapshot_bytes()
+    if snapshot:
+        await websocket.send_bytes(snapshot)
+
+    # Stream updates; a slow client simply skips to the newest payload
     try:
         while True:
-            data = await queue.get()
+            seq, data = await broadcaster.wait_update(seq)
             await websocket.send_bytes(data)
     except WebSocketDisconnect:
         pass
@@ -43,5 +42,3 @@ async def vehicle_ws(websocket: WebSocket) -> None:
         pass
     except Exception:
         logger.exception("WebSocket error")
-    finally:
-        broadcaster.unsubscribe(queue)
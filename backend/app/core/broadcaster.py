@@ -3,7 +3,6 @@
 import asyncio
 import logging
 
-import orjson
 import redis.asyncio as aioredis
 
 from app.config import settings
@@ -11,15 +10,26 @@ from app.config import settings
 logger = logging.getLogger(__name__)
 
 CHANNEL = "tram:vehicles"
-STATE_KEY = "tram:state"
+# Latest state, pre-tagged as "snapshot" for new WebSocket clients
+SNAPSHOT_KEY = "tram:snapshot"
+
+_UPDATE_PREFIX = b'{"type":"update",'
+_SNAPSHOT_PREFIX = b'{"type":"snapshot",'
 
 
 class Broadcaster:
-    """Publishes vehicle state to Redis and manages WebSocket subscribers."""
+    """Publishes vehicle state to Redis and to local WebSocket listeners.
+
+    Every update is a full state, so listeners only ever need the newest
+    payload: publish stores it with a sequence number and wakes everyone
+    waiting, without per-subscriber queues.
+    """
 
     def __init__(self) -> None:
         self._redis: aioredis.Redis | None = None
-        self._subscribers: set[asyncio.Queue] = set()
+        self._seq = 0
+        self._latest: bytes = b""
+        self._event = asyncio.Event()
 
     async def connect(self) -> None:
         self._redis = aioredis.from_url(settings.redis_url, decode_responses=False)
@@ -28,43 +38,48 @@ class Broadcaster:
         if self._redis:
             await self._redis.aclose()
 
-    async def publish(self, vehicles_data: list[dict]) -> None:
-        """Publish vehicle state update to Redis and fan out to WebSocket subscribers."""
-        payload = orjson.dumps({"type": "update", "vehicles": vehicles_data})
+    async def publish(self, vehicles_json: bytes) -> None:
+        """Publish vehicle state update to Redis and fan out to WebSocket subscribers.
+
+        `vehicles_json` is the already-serialized JSON array of vehicle states.
+        """
+        payload = b"".join((_UPDATE_PREFIX, b'"vehicles":', vehicles_json, b"}"))
+        # Re-tag the serialized update instead of dumping the vehicles twice
+        snapshot = _SNAPSHOT_PREFIX + payload[len(_UPDATE_PREFIX):]
 
         if self._redis:
             try:
-                # Store current state for new connections
-                await self._redis.set(STATE_KEY, payload)
-                # Publish to channel
-                await self._redis.publish(CHANNEL, payload)
+                # Store the snapshot for new connections and publish to the
+                # channel in a single round-trip
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.set(SNAPSHOT_KEY, snapshot)
+                    pipe.publish(CHANNEL, payload)
+                    await pipe.execute()
             except Exception:
                 logger.exception("Failed to publish to Redis")
 
-        # Fan out directly to WebSocket subscribers
-        dead = set()
-        for q in self._subscribers:
-            try:
-                q.put_nowait(payload)
-            except asyncio.QueueFull:
-                dead.add(q)
-        self._subscribers -= dead
+        # Swap in a fresh event so listeners woken by this update wait on the next one
+        self._latest = payload
+        self._seq += 1
+        event, self._event = self._event, asyncio.Event()
+        event.set()
 
-    async def get_current_state(self) -> bytes | None:
-        """Get latest vehicle state snapshot from Redis."""
+    async def get_snapshot_bytes(self) -> bytes | None:
+        """Get latest state as a ready-to-send {"type": "snapshot", ...} message."""
         if self._redis:
             try:
-                data = await self._redis.get(STATE_KEY)
-                return data
+                return await self._redis.get(SNAPSHOT_KEY)
             except Exception:
-                logger.exception("Failed to get state from Redis")
+                logger.exception("Failed to get snapshot from Redis")
         return None
 
-    def subscribe(self) -> asyncio.Queue:
-        """Create a new subscriber queue for WebSocket fan-out."""
-        q: asyncio.Queue = asyncio.Queue(maxsize=10)
-        self._subscribers.add(q)
-        return q
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest published update."""
+        return self._seq
 
-    def unsubscribe(self, q: asyncio.Queue) -> None:
-        self._subscribers.discard(q)
+    async def wait_update(self, last_seq: int) -> tuple[int, bytes]:
+        """Wait until an update newer than `last_seq` is published; return (seq, payload)."""
+        while self._seq == last_seq:
+            await self._event.wait()
+        return self._seq, self._latest
@@ -1,7 +1,8 @@
-"""Calculate ETA to upcoming stops based on speed and GPS distance."""
+"""Calculate ETA to upcoming stops based on speed and distance along the stop sequence."""
 
 import logging
-import math
+
+import numpy as np
 
 from app.core.stop_detector import StopOnRoute
 
@@ -12,31 +13,23 @@ MIN_SPEED_KMH = 5.0
 # Maximum reasonable ETA (seconds)
 MAX_ETA_SECONDS = 3600
 
-# Approximate meters per degree at Yekaterinburg latitude (~56.8)
-_LAT_M = 111_320.0
-_LON_M = 111_320.0 * math.cos(math.radians(56.84))
-
-
-def _gps_dist_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    dlat = (lat2 - lat1) * _LAT_M
-    dlon = (lon2 - lon1) * _LON_M
-    return math.sqrt(dlat * dlat + dlon * dlon)
-
 
 class EtaCalculator:
-    """Speed-based ETA using GPS distances along the stop sequence."""
+    """Speed-based ETA using distances along the stop sequence."""
 
     def calculate(
         self,
-        vehicle_lat: float,
-        vehicle_lon: float,
+        distance_along_m: float,
         speed_kmh: float,
         next_stops: list[StopOnRoute],
+        cumulative_m: np.ndarray | None = None,
     ) -> list[tuple[StopOnRoute, int | None]]:
         """Calculate ETA in seconds to each next stop.
 
-        Uses GPS distance from the vehicle to the first next stop, then
-        cumulative inter-stop distances for subsequent stops.
+        distance_along_m: vehicle position on the stop sequence, in the same
+        frame as cumulative_distance_m (see DetectionResult.distance_along_m).
+        cumulative_m: cumulative_distance_m of next_stops as an array (the
+        slice cached by StopDetector); built from next_stops if omitted.
         """
         if not next_stops:
             return []
@@ -44,23 +37,17 @@ class EtaCalculator:
         effective_speed = max(speed_kmh, MIN_SPEED_KMH)
         speed_ms = effective_speed / 3.6  # km/h -> m/s
 
-        # Distance from vehicle to first upcoming stop
-        dist_to_first = _gps_dist_m(
-            vehicle_lat, vehicle_lon,
-            next_stops[0].lat, next_stops[0].lon,
-        )
-        first_cum = next_stops[0].cumulative_distance_m
-
-        results = []
-        for stop in next_stops:
-            # Distance = (vehicle→first_stop) + (first_stop→this_stop along route)
-            remaining_m = dist_to_first + (stop.cumulative_distance_m - first_cum)
-            if remaining_m < 0:
-                remaining_m = 0
+        if cumulative_m is None:
+            cumulative_m = np.fromiter(
+                (s.cumulative_distance_m for s in next_stops),
+                dtype=np.float64, count=len(next_stops),
+            )
 
-            eta_s = int(remaining_m / speed_ms)
-            if eta_s > MAX_ETA_SECONDS:
-                eta_s = None  # Too far out to be reliable
-            results.append((stop, eta_s))
+        remaining_m = np.maximum(cumulative_m - distance_along_m, 0.0)
+        eta_s = (remaining_m / speed_ms).astype(np.int64)
 
-        return results
+        # ETAs beyond MAX_ETA_SECONDS are too far out to be reliable
+        return [
+            (stop, eta if eta <= MAX_ETA_SECONDS else None)
+            for stop, eta in zip(next_stops, eta_s.tolist())
+        ]
@@ -2,10 +2,18 @@
 
 import asyncio
 import datetime
+import functools
 import logging
+import operator
+import random
+import time
+from collections import namedtuple
+from collections.abc import Callable
 from dataclasses import dataclass, field
+from sys import intern
 
 import httpx
+import orjson
 
 from app.config import settings
 
@@ -14,26 +22,131 @@ logger = logging.getLogger(__name__)
 # ETTU API layer identifiers
 LAYER_TRAM = 0
 
+# Endpoints that support conditional re-fetching (change on the order of weeks)
+ROUTES_PATH = "/api/v2/tram/routes/"
+STOPS_PATH = "/api/v2/tram/points/"
+
 # Retry configuration
 MAX_RETRIES = 3
-RETRY_BACKOFF = [2, 4, 8]  # seconds between retries
+RETRY_BASE_S = 1.0  # backoff jitter floor
+RETRY_CAP_S = 10.0  # longest single wait between retries
 
 # ETTU timestamps are in Asia/Yekaterinburg (UTC+5)
 _EKB_TZ = datetime.timezone(datetime.timedelta(hours=5))
-
-
+_EKB_OFFSET = datetime.timedelta(hours=5)
+_UTC = datetime.timezone.utc
+
+
+# Record field aliases, in lookup order: (field, aliases, default).
+# ETTU has served both upper- and lower-case schemas.
+_VEHICLE_FIELDS: tuple[tuple[str, tuple[str, ...], object], ...] = (
+    ("dev_id", ("DEV_ID", "dev_id"), ""),
+    ("board_num", ("BOARD_NUM", "board_num", "gos_num"), ""),
+    ("route_num", ("ROUTE", "route", "marsh"), ""),
+    ("lat", ("LAT", "lat"), 0),
+    ("lon", ("LON", "lon", "lng"), 0),
+    ("speed", ("VELOCITY", "SPEED", "speed"), 0),
+    ("course", ("COURSE", "course", "dir"), 0),
+    ("on_route", ("ON_ROUTE", "on_route"), 0),
+    ("layer", ("LAYER", "layer"), -1),
+    ("timestamp", ("ATIME", "TIMESTAMP", "timestamp"), ""),
+)
+# Text fields where an empty value falls through to the next alias
+_STOP_NAME_KEYS = ("NAME", "name")
+_STOP_DIRECTION_KEYS = ("DIRECTION", "direction")
+_STOP_FIELDS: tuple[tuple[str, tuple[str, ...], object], ...] = (
+    ("id", ("ID", "id"), 0),
+    ("name", _STOP_NAME_KEYS, ""),
+    ("lat", ("LAT", "lat"), 0),
+    ("lon", ("LON", "lon", "lng"), 0),
+    ("direction", _STOP_DIRECTION_KEYS, ""),
+)
+
+
+def _read_fields(item: dict, fields) -> tuple:
+    """Generic alias lookup for one record (first alias present wins)."""
+    out = []
+    for _, aliases, default in fields:
+        for key in aliases:
+            if key in item:
+                out.append(item[key])
+                break
+        else:
+            out.append(default)
+    return tuple(out)
+
+
+def _first_truthy(item: dict, aliases: tuple[str, ...]):
+    """First non-empty value among `aliases`, like an `a or b or ""` chain."""
+    for key in aliases:
+        if value := item.get(key):
+            return value
+    return ""
+
+
+def _schema_reader(sample: dict, fields) -> Callable[[dict], tuple]:
+    """Build a field reader specialized to the key schema of `sample`.
+
+    The alias for each field is resolved once and records with exactly the
+    sample's key set are read with a single itemgetter call. Any other record
+    goes through _read_fields, so a field absent from the sample is not
+    frozen to its default for records that do carry it.
+    """
+    keyset = frozenset(sample)
+    keys = [next((k for k in aliases if k in sample), None) for _, aliases, _ in fields]
+    present = [i for i, k in enumerate(keys) if k is not None]
+    if not present:
+        return lambda item: _read_fields(item, fields)
+    getter = operator.itemgetter(*(keys[i] for i in present))
+
+    if len(present) == len(fields):
+        def read(item: dict) -> tuple:
+            if item.keys() == keyset:
+                return getter(item)
+            return _read_fields(item, fields)
+        return read
+
+    # Fields absent from the schema take their defaults
+    template = [default for _, _, default in fields]
+
+    def read_partial(item: dict) -> tuple:
+        if item.keys() != keyset:
+            return _read_fields(item, fields)
+        vals = getter(item)
+        if len(present) == 1:
+            vals = (vals,)
+        out = template.copy()
+        for i, v in zip(present, vals):
+            out[i] = v
+        return tuple(out)
+    return read_partial
+
+
+@functools.lru_cache(maxsize=4096)
 def _parse_atime(raw: str) -> datetime.datetime | None:
-    """Parse ETTU ATIME string like '2026-02-13 16:30:42' (Yekaterinburg local) to UTC datetime."""
+    """Parse ETTU ATIME string like '2026-02-13 16:30:42' (Yekaterinburg local) to UTC datetime.
+
+    Cached: many vehicles in one poll report the same ATIME.
+    """
     if not raw:
         return None
     try:
+        # Fast path for the canonical fixed-width layout; UTC+5 has no DST,
+        # so conversion is a plain subtraction.
+        if (len(raw) == 19 and raw[4] == "-" and raw[7] == "-" and raw[10] == " "
+                and raw[13] == ":" and raw[16] == ":"):
+            return datetime.datetime(
+                int(raw[0:4]), int(raw[5:7]), int(raw[8:10]),
+                int(raw[11:13]), int(raw[14:16]), int(raw[17:19]),
+                tzinfo=_UTC,
+            ) - _EKB_OFFSET
         local = datetime.datetime.strptime(raw, "%Y-%m-%d %H:%M:%S").replace(tzinfo=_EKB_TZ)
-        return local.astimezone(datetime.timezone.utc)
+        return local.astimezone(_UTC)
     except (ValueError, TypeError):
         return None
 
 
-@dataclass
+@dataclass(slots=True)
 class RawVehicle:
     dev_id: str
     board_num: str
@@ -48,7 +161,7 @@ class RawVehicle:
     atime_utc: datetime.datetime | None = None  # parsed ATIME in UTC
 
 
-@dataclass
+@dataclass(slots=True)
 class RawStop:
     id: int
     name: str
@@ -57,14 +170,168 @@ class RawStop:
     direction: str = ""  # e.g. "на Пионерскую"
 
 
-@dataclass
+# One entry of a route path; name/coordinates are resolved later from the stop list
+RawRouteStop = namedtuple("RawRouteStop", ("id", "order", "direction"))
+
+
+@dataclass(slots=True)
 class RawRoute:
     id: int
     number: str
     name: str = ""
     points: list[list[float]] = field(default_factory=list)  # [[lat, lon], ...]
-    stops: list[dict] = field(default_factory=list)  # [{id, name, lat, lon, order, direction}]
-    geometry_stops: list[dict] = field(default_factory=list)  # subset used for geometry only
+    stops: list[RawRouteStop] = field(default_factory=list)
+    geometry_stops: list[RawRouteStop] = field(default_factory=list)  # subset used for geometry only
+
+
+def _parse_vehicles(items: list, read: Callable[[dict], tuple]) -> list[RawVehicle]:
+    """Convert boards records to RawVehicle, dropping inactive and malformed ones.
+
+    Pure and synchronous: fetch_vehicles only does the HTTP round-trip and decoding.
+    """
+    vehicles = []
+    for item in items:
+        try:
+            (dev_id, board_num, route_num, lat, lon, speed, course,
+             on_route, layer, raw_ts) = read(item)
+            lat = float(lat)
+            lon = float(lon)
+            route_num = str(route_num)
+            # Only trams with valid coordinates and a route assigned; checked
+            # before the remaining conversions and the ATIME parse
+            if lat == 0 or lon == 0 or not route_num:
+                continue
+            raw_ts = str(raw_ts)
+            # Positional in RawVehicle field order: keyword arguments cost
+            # several times more per record in the generated __init__
+            vehicles.append(RawVehicle(
+                # Interned: these recur every poll and key the tracker's dicts
+                intern(str(dev_id)),
+                str(board_num),
+                intern(route_num),
+                lat,
+                lon,
+                float(speed),
+                float(course),
+                bool(int(on_route)) if on_route is not None else False,
+                int(layer),
+                raw_ts,
+                _parse_atime(raw_ts),
+            ))
+        except (ValueError, TypeError) as e:
+            logger.debug("Skipping malformed vehicle record: %s", e)
+            continue
+    return vehicles
+
+
+def _extract_stop_id(item) -> int | None:
+    """Extract stop ID from various formats: int, str, or dict with id/ID (None if unusable)."""
+    try:
+        if isinstance(item, dict):
+            raw = item.get("id", item.get("ID"))
+            return int(raw) if raw is not None else None
+        return int(item)
+    except (ValueError, TypeError):
+        return None
+
+
+def _path_stops(path: list, direction: int) -> list[RawRouteStop]:
+    """Ordered stop entries for one ETTU element path (order = position in path)."""
+    # A path is uniformly plain IDs or uniformly dicts; check the shape once
+    if path and not isinstance(path[0], dict):
+        try:
+            return [
+                RawRouteStop(int(stop_item), order, direction)
+                for order, stop_item in enumerate(path)
+            ]
+        except (ValueError, TypeError):
+            pass  # mixed or malformed entries: extract one by one
+    extract = _extract_stop_id
+    return [
+        RawRouteStop(sid, order, direction)
+        for order, stop_item in enumerate(path)
+        if (sid := extract(stop_item)) is not None
+    ]
+
+
+def _decode_routes(body: bytes) -> list[RawRoute]:
+    """Decode and parse an ETTU routes response body."""
+    data = orjson.loads(body)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Routes response keys=%s count=%d", list(data.keys()) if isinstance(data, dict) else "list", len(data if isinstance(data, list) else data.get("routes", [])))
+    return _parse_routes(data)
+
+
+def _parse_routes(data) -> list[RawRoute]:
+    """Parse a decoded ETTU routes payload."""
+    routes = []
+    items = data if isinstance(data, list) else data.get("routes", [])
+    for item in items:
+        route = RawRoute(
+            id=int(item.get("id", item.get("ID", 0))),
+            number=str(item.get("num", item.get("NUM", item.get("number", "")))),
+            name=str(item.get("name", item.get("NAME", item.get("title", "")))),
+        )
+
+        # Parse elements → extract ordered stop IDs from path
+        elements = item.get("elements", [])
+        if isinstance(elements, list):
+            for dir_idx, elem in enumerate(elements):
+                # Use element position as direction (0=forward, 1=reverse),
+                # NOT elem["ind"] which is an opaque element ID (e.g. 30, 40)
+                direction = dir_idx
+                # full_path has ALL stops (for tracking);
+                # path has major stops only (for clean geometry)
+                full_path = elem.get("full_path", elem.get("path", []))
+                geom_path = elem.get("path", full_path)
+                # Also check for element-level 'stops' as alternative source
+                if not full_path:
+                    elem_stops = elem.get("stops", elem.get("stations", []))
+                    if isinstance(elem_stops, list):
+                        full_path = elem_stops
+                        if not geom_path:
+                            geom_path = elem_stops
+                if isinstance(full_path, list):
+                    route.stops += _path_stops(full_path, direction)
+                if isinstance(geom_path, list):
+                    route.geometry_stops += _path_stops(geom_path, direction)
+
+        # Fallback: route-level stops/stations if elements yielded nothing
+        if not route.stops:
+            route_stops = item.get("stops", item.get("stations", []))
+            if isinstance(route_stops, list):
+                for order, stop_item in enumerate(route_stops):
+                    sid = _extract_stop_id(stop_item)
+                    if sid is None:
+                        continue
+                    try:
+                        direction = 0
+                        if isinstance(stop_item, dict):
+                            direction = int(stop_item.get("direction", stop_item.get("ind", 0)))
+                    except (ValueError, TypeError):
+                        continue
+                    route.stops.append(RawRouteStop(sid, order, direction))
+
+        if not route.stops:
+            logger.warning(
+                "Route %s (%s): 0 stops parsed. keys=%s, elements_count=%d",
+                route.number, route.name,
+                list(item.keys()),
+                len(elements) if isinstance(elements, list) else -1,
+            )
+
+        routes.append(route)
+    return routes
+
+
+def _copy_route(route: RawRoute) -> RawRoute:
+    """Copy of a route whose lists can be replaced or extended independently."""
+    return RawRoute(
+        id=route.id, number=route.number, name=route.name,
+        points=list(route.points),
+        stops=list(route.stops),
+        geometry_stops=list(route.geometry_stops),
+    )
 
 
 class EttuClient:
@@ -77,233 +344,207 @@ class EttuClient:
             headers={"Accept": "application/json"},
             params={"apiKey": "111"},
             verify=False,
+            # Every poll hits the same host: multiplex over one long-lived connection
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=16, keepalive_expiry=300),
         )
+        # Conditional-GET state per path: (ETag, Last-Modified, parsed result)
+        self._conditional: dict[str, tuple[str | None, str | None, list]] = {}
+        # Field readers for the last seen record schema, per payload kind: (keys, reader)
+        self._readers: dict[str, tuple[frozenset, Callable[[dict], tuple]]] = {}
+        # (ETag, Last-Modified, body) of the last freshly parsed routes response,
+        # for callers that persist it; None after a 304 or a failure
+        self.routes_response: tuple[str | None, str | None, bytes] | None = None
+        # True when the last fetch_routes() got a 304, i.e. the previously
+        # persisted response is confirmed current
+        self.routes_not_modified = False
 
     async def close(self) -> None:
         await self._client.aclose()
 
-    async def _get_with_retry(self, path: str, label: str) -> httpx.Response | None:
-        """GET request with retry and exponential backoff."""
+    async def get_raw(self, path: str) -> httpx.Response:
+        """Single GET over the shared connection pool, no retries (for debugging endpoints)."""
+        resp = await self._client.get(path)
+        resp.raise_for_status()
+        return resp
+
+    async def _get_with_retry(
+        self, path: str, label: str, budget_s: float | None = None,
+    ) -> httpx.Response | None:
+        """GET request with retry and jittered exponential backoff.
+
+        With `budget_s`, a retry whose backoff would end past that many seconds
+        from the first attempt is abandoned instead. Paths with a remembered
+        result are requested conditionally; a 304 Not Modified response is
+        returned as-is.
+        """
+        deadline = time.monotonic() + budget_s if budget_s is not None else None
+        headers = {}
+        cached = self._conditional.get(path)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        wait = RETRY_BASE_S
         for attempt in range(MAX_RETRIES + 1):
             try:
-                resp = await self._client.get(path)
+                resp = await self._client.get(path, headers=headers)
+                if resp.status_code == 304:
+                    return resp
                 resp.raise_for_status()
                 return resp
             except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ConnectError) as e:
-                if attempt < MAX_RETRIES:
-                    wait = RETRY_BACKOFF[attempt]
-                    logger.warning(
-                        "%s attempt %d/%d failed (%s), retrying in %ds",
-                        label, attempt + 1, MAX_RETRIES + 1, type(e).__name__, wait,
-                    )
-                    await asyncio.sleep(wait)
-                else:
+                if attempt == MAX_RETRIES:
                     logger.error("%s failed after %d attempts: %s", label, MAX_RETRIES + 1, e)
                     return None
+                reason = type(e).__name__
             except httpx.HTTPStatusError as e:
-                if e.response.status_code >= 500 and attempt < MAX_RETRIES:
-                    wait = RETRY_BACKOFF[attempt]
-                    logger.warning(
-                        "%s attempt %d/%d got HTTP %d, retrying in %ds",
-                        label, attempt + 1, MAX_RETRIES + 1, e.response.status_code, wait,
-                    )
-                    await asyncio.sleep(wait)
-                else:
+                # Only server errors are worth retrying
+                if e.response.status_code < 500 or attempt == MAX_RETRIES:
                     logger.error("Failed to fetch %s from ETTU: %s", label, e)
                     return None
+                reason = f"HTTP {e.response.status_code}"
             except Exception:
                 logger.exception("Failed to fetch %s from ETTU", label)
                 return None
+
+            # Decorrelated jitter keeps retries from many callers out of lockstep
+            wait = min(RETRY_CAP_S, random.uniform(RETRY_BASE_S, wait * 3))
+            if deadline is not None and time.monotonic() + wait > deadline:
+                logger.warning("%s attempt %d failed (%s), no time left to retry", label, attempt + 1, reason)
+                return None
+            logger.warning(
+                "%s attempt %d/%d failed (%s), retrying in %.1fs",
+                label, attempt + 1, MAX_RETRIES + 1, reason, wait,
+            )
+            await asyncio.sleep(wait)
         return None
 
+    def _reader_for(self, kind: str, sample: dict, fields) -> Callable[[dict], tuple]:
+        """Schema reader for records like `sample`, reused while ETTU's schema is unchanged."""
+        cached = self._readers.get(kind)
+        if cached is None or cached[0] != sample.keys():
+            cached = (frozenset(sample), _schema_reader(sample, fields))
+            self._readers[kind] = cached
+        return cached[1]
+
+    def _remember(self, path: str, resp: httpx.Response, parsed: list) -> None:
+        """Keep a parsed result for conditional re-fetches of `path`."""
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if parsed and (etag or last_modified):
+            self._conditional[path] = (etag, last_modified, parsed)
+        else:
+            self._conditional.pop(path, None)
+
     async def fetch_vehicles(self) -> list[RawVehicle]:
         """Fetch all current tram positions."""
-        resp = await self._get_with_retry("/api/v2/tram/boards/", "vehicles")
+        # Retries must not run into the next scheduled poll
+        resp = await self._get_with_retry(
+            "/api/v2/tram/boards/", "vehicles", budget_s=settings.poll_interval_seconds * 0.8,
+        )
         if resp is None:
             return []
         try:
-            data = resp.json()
-            logger.debug("Boards response keys=%s count=%d", list(data.keys()) if isinstance(data, dict) else "list", len(data if isinstance(data, list) else data.get("vehicles", [])))
+            data = orjson.loads(resp.content)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Boards response keys=%s count=%d", list(data.keys()) if isinstance(data, dict) else "list", len(data if isinstance(data, list) else data.get("vehicles", [])))
         except Exception:
             logger.exception("Failed to parse vehicles response from ETTU")
             return []
 
-        vehicles = []
-        for item in data if isinstance(data, list) else data.get("vehicles", data.get("boards", [])):
-            try:
-                layer = int(item.get("LAYER", item.get("layer", -1)))
-                on_route = item.get("ON_ROUTE", item.get("on_route", 0))
-
-                raw_ts = str(item.get("ATIME", item.get("TIMESTAMP", item.get("timestamp", ""))))
-                vehicle = RawVehicle(
-                    dev_id=str(item.get("DEV_ID", item.get("dev_id", ""))),
-                    board_num=str(item.get("BOARD_NUM", item.get("board_num", item.get("gos_num", "")))),
-                    route_num=str(item.get("ROUTE", item.get("route", item.get("marsh", "")))),
-                    lat=float(item.get("LAT", item.get("lat", 0))),
-                    lon=float(item.get("LON", item.get("lon", item.get("lng", 0)))),
-                    speed=float(item.get("VELOCITY", item.get("SPEED", item.get("speed", 0)))),
-                    course=float(item.get("COURSE", item.get("course", item.get("dir", 0)))),
-                    on_route=bool(int(on_route)) if on_route is not None else False,
-                    layer=layer,
-                    timestamp=raw_ts,
-                    atime_utc=_parse_atime(raw_ts),
-                )
-                # Include trams with valid coordinates and a route assigned
-                if vehicle.lat != 0 and vehicle.lon != 0 and vehicle.route_num:
-                    vehicles.append(vehicle)
-            except (ValueError, TypeError) as e:
-                logger.debug("Skipping malformed vehicle record: %s", e)
-                continue
+        items = data if isinstance(data, list) else data.get("vehicles", data.get("boards", []))
+        read = self._reader_for("vehicles", items[0], _VEHICLE_FIELDS) if items else None
+        vehicles = _parse_vehicles(items, read) if items else []
 
         logger.info("Fetched %d active trams from ETTU", len(vehicles))
         return vehicles
 
-    @staticmethod
-    def _extract_stop_id(item) -> int | None:
-        """Extract stop ID from various formats: int, str, or dict with id/ID."""
-        if isinstance(item, dict):
-            raw = item.get("id", item.get("ID"))
-            if raw is not None:
-                return int(raw)
-            return None
-        return int(item)
-
     async def fetch_routes(self) -> list[RawRoute]:
         """Fetch tram route data."""
         routes = []
-        resp = await self._get_with_retry("/api/v2/tram/routes/", "routes")
+        self.routes_response = None
+        self.routes_not_modified = False
+        resp = await self._get_with_retry(ROUTES_PATH, "routes")
         if resp is None:
             logger.info("Fetched 0 tram routes from ETTU")
             return routes
+        if resp.status_code == 304:
+            # Callers mutate routes in place, so hand out copies of the cached parse
+            routes = [_copy_route(r) for r in self._conditional[ROUTES_PATH][2]]
+            self.routes_not_modified = True
+            logger.info("Tram routes not modified, reusing %d parsed routes", len(routes))
+            return routes
 
         try:
-            data = resp.json()
-            logger.debug("Routes response keys=%s count=%d", list(data.keys()) if isinstance(data, dict) else "list", len(data if isinstance(data, list) else data.get("routes", [])))
-
-            items = data if isinstance(data, list) else data.get("routes", [])
-            for item in items:
-                route = RawRoute(
-                    id=int(item.get("id", item.get("ID", 0))),
-                    number=str(item.get("num", item.get("NUM", item.get("number", "")))),
-                    name=str(item.get("name", item.get("NAME", item.get("title", "")))),
-                )
-
-                # Parse elements → extract ordered stop IDs from path
-                elements = item.get("elements", [])
-                if isinstance(elements, list):
-                    for dir_idx, elem in enumerate(elements):
-                        # Use element position as direction (0=forward, 1=reverse),
-                        # NOT elem["ind"] which is an opaque element ID (e.g. 30, 40)
-                        direction = dir_idx
-                        # full_path has ALL stops (for tracking);
-                        # path has major stops only (for clean geometry)
-                        full_path = elem.get("full_path", elem.get("path", []))
-                        geom_path = elem.get("path", full_path)
-                        # Also check for element-level 'stops' as alternative source
-                        if not full_path:
-                            elem_stops = elem.get("stops", elem.get("stations", []))
-                            if isinstance(elem_stops, list):
-                                full_path = elem_stops
-                                if not geom_path:
-                                    geom_path = elem_stops
-                        if isinstance(full_path, list):
-                            for order, stop_item in enumerate(full_path):
-                                try:
-                                    sid = self._extract_stop_id(stop_item)
-                                    if sid is None:
-                                        continue
-                                    route.stops.append({
-                                        "id": sid,
-                                        "name": "",
-                                        "lat": 0.0,
-                                        "lon": 0.0,
-                                        "order": order,
-                                        "direction": direction,
-                                    })
-                                except (ValueError, TypeError):
-                                    continue
-                        if isinstance(geom_path, list):
-                            for order, stop_item in enumerate(geom_path):
-                                try:
-                                    sid = self._extract_stop_id(stop_item)
-                                    if sid is None:
-                                        continue
-                                    route.geometry_stops.append({
-                                        "id": sid,
-                                        "name": "",
-                                        "lat": 0.0,
-                                        "lon": 0.0,
-                                        "order": order,
-                                        "direction": direction,
-                                    })
-                                except (ValueError, TypeError):
-                                    continue
-
-                # Fallback: route-level stops/stations if elements yielded nothing
-                if not route.stops:
-                    route_stops = item.get("stops", item.get("stations", []))
-                    if isinstance(route_stops, list):
-                        for order, stop_item in enumerate(route_stops):
-                            try:
-                                sid = self._extract_stop_id(stop_item)
-                                if sid is None:
-                                    continue
-                                direction = 0
-                                if isinstance(stop_item, dict):
-                                    direction = int(stop_item.get("direction", stop_item.get("ind", 0)))
-                                route.stops.append({
-                                    "id": sid,
-                                    "name": "",
-                                    "lat": 0.0,
-                                    "lon": 0.0,
-                                    "order": order,
-                                    "direction": direction,
-                                })
-                            except (ValueError, TypeError):
-                                continue
-
-                if not route.stops:
-                    logger.warning(
-                        "Route %s (%s): 0 stops parsed. keys=%s, elements_count=%d",
-                        route.number, route.name,
-                        list(item.keys()),
-                        len(elements) if isinstance(elements, list) else -1,
-                    )
-
-                routes.append(route)
+            # Hundreds of routes with full stop paths: keep the parse off the event loop
+            routes = await asyncio.to_thread(_decode_routes, resp.content)
+            self._remember(ROUTES_PATH, resp, [_copy_route(r) for r in routes])
+            if routes:
+                self.routes_response = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"), resp.content)
         except Exception:
             logger.exception("Failed to parse routes from ETTU")
 
         logger.info("Fetched %d tram routes from ETTU", len(routes))
         return routes
 
+    async def load_routes(self, body: bytes, etag: str | None, last_modified: str | None) -> list[RawRoute]:
+        """Parse a previously persisted routes response.
+
+        Its validators are remembered, so the next fetch_routes() is conditional.
+        """
+        try:
+            routes = await asyncio.to_thread(_decode_routes, body)
+        except Exception:
+            logger.exception("Failed to parse cached routes response")
+            return []
+        if routes and (etag or last_modified):
+            self._conditional[ROUTES_PATH] = (etag, last_modified, [_copy_route(r) for r in routes])
+        return routes
+
     async def fetch_stops(self) -> list[RawStop]:
         """Fetch all tram stops."""
         stops = []
-        resp = await self._get_with_retry("/api/v2/tram/points/", "stops")
+        resp = await self._get_with_retry(STOPS_PATH, "stops")
         if resp is None:
             logger.info("Fetched 0 tram stops from ETTU")
             return stops
+        if resp.status_code == 304:
+            stops = list(self._conditional[STOPS_PATH][2])
+            logger.info("Tram stops not modified, reusing %d parsed stops", len(stops))
+            return stops
 
         try:
-            data = resp.json()
+            data = orjson.loads(resp.content)
             items = data if isinstance(data, list) else (
                 data.get("points", data.get("stops", data.get("stations", [])))
             )
+            read = self._reader_for("stops", items[0], _STOP_FIELDS) if items else None
             for item in items:
                 try:
-                    stop_id = int(item.get("ID", item.get("id", 0)))
+                    stop_id, name, lat, lon, direction = read(item)
+                    # The alias lookup only skips missing keys; empty text
+                    # still falls through to the alternate key
+                    if not name:
+                        name = _first_truthy(item, _STOP_NAME_KEYS)
+                    if not direction:
+                        direction = _first_truthy(item, _STOP_DIRECTION_KEYS)
+                    stop_id = int(stop_id)
                     if stop_id == 0:
                         continue
-                    name = str(item.get("NAME") or item.get("name") or "").strip()
-                    lat = float(item.get("LAT", item.get("lat", 0)))
-                    lon = float(item.get("LON", item.get("lon", item.get("lng", 0))))
+                    lat = float(lat)
+                    lon = float(lon)
                     if lat == 0 or lon == 0:
                         continue
-                    direction = str(item.get("DIRECTION") or item.get("direction") or "").strip()
-                    stops.append(RawStop(id=stop_id, name=name, lat=lat, lon=lon, direction=direction))
+                    # Positional in field order, as in _parse_vehicles
+                    stops.append(RawStop(
+                        stop_id, str(name or "").strip(), lat, lon, str(direction or "").strip(),
+                    ))
                 except (ValueError, TypeError):
                     continue
+            self._remember(STOPS_PATH, resp, list(stops))
         except Exception:
             logger.exception("Failed to parse stops from ETTU")
 
@@ -1,113 +1,236 @@
-"""Snap GPS positions to route LineStrings using Shapely linear referencing."""
+"""Snap GPS positions to route polylines projected to local meters."""
 
 import logging
 import math
 from dataclasses import dataclass
 
-from shapely.geometry import LineString, Point
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 # Max distance (meters) from route to consider a valid snap
 MAX_SNAP_DISTANCE_M = 300
 
+# Segment-hinted snapping: initial half-width (segments) of the search window
+# around the previous match, and the distance beyond which a hinted result is
+# distrusted and the whole route is rescanned
+HINT_WINDOW = 16
+HINT_MAX_DIST_M = 50.0
+
 # Approximate meters per degree at Yekaterinburg latitude (~56.8)
 LAT_M_PER_DEG = 111_320.0
 LON_M_PER_DEG = 111_320.0 * math.cos(math.radians(56.84))
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MatchResult:
     progress: float  # 0.0–1.0 along the route
     distance_m: float  # perpendicular distance from route in meters
     direction: int  # 0=forward, 1=reverse (based on heading)
+    segment: int = 0  # index of the polyline segment snapped to (hint for the next match)
+
+
+@dataclass(slots=True)
+class _RouteGeometry:
+    """Route polyline projected to local meters, with per-segment vectors."""
+
+    ax: np.ndarray  # segment start x (m), one entry per segment
+    ay: np.ndarray  # segment start y (m)
+    dx: np.ndarray  # segment vector x (m)
+    dy: np.ndarray  # segment vector y (m)
+    len_sq: np.ndarray  # squared segment length (m²), floored to avoid /0
+    seg_len: np.ndarray  # segment length (m)
+    cum: np.ndarray  # distance along route at each segment start (m)
+    bearing: np.ndarray  # route bearing (deg) across ±0.5% of the route around each segment's midpoint
+    total_m: float
+
+    @classmethod
+    def from_coords(cls, coords: list[list[float]]) -> "_RouteGeometry":
+        arr = np.asarray(coords, dtype=np.float64)
+        xs = arr[:, 1] * LON_M_PER_DEG
+        ys = arr[:, 0] * LAT_M_PER_DEG
+        dx, dy = np.diff(xs), np.diff(ys)
+        seg_len = np.hypot(dx, dy)
+        cum = np.concatenate(([0.0], np.cumsum(seg_len)))
+        total_m = float(cum[-1])
+        # Direction inference compares the heading with a chord rather than a
+        # single (possibly very short) segment, so precompute it per segment
+        mid = cum[:-1] + seg_len / 2
+        half = 0.005 * total_m
+        x1 = np.interp(np.maximum(mid - half, 0.0), cum, xs)
+        y1 = np.interp(np.maximum(mid - half, 0.0), cum, ys)
+        x2 = np.interp(np.minimum(mid + half, total_m), cum, xs)
+        y2 = np.interp(np.minimum(mid + half, total_m), cum, ys)
+        return cls(
+            ax=xs[:-1], ay=ys[:-1], dx=dx, dy=dy,
+            len_sq=np.maximum(dx * dx + dy * dy, 1e-12),
+            seg_len=seg_len,
+            cum=cum[:-1],
+            bearing=np.degrees(np.arctan2(x2 - x1, y2 - y1)) % 360,
+            total_m=total_m,
+        )
+
+    def snap(
+        self, px: float, py: float, segs: slice | None = None,
+    ) -> tuple[int, float, float, float]:
+        """Project a point (in projected meters) onto the polyline.
+
+        Returns (segment index, t within segment, distance along route m,
+        perpendicular distance m). All segments are evaluated in one pass,
+        or only the `segs` slice when given.
+        """
+        if segs is None:
+            ax, ay, dx, dy, len_sq = self.ax, self.ay, self.dx, self.dy, self.len_sq
+        else:
+            ax, ay, dx, dy, len_sq = self.ax[segs], self.ay[segs], self.dx[segs], self.dy[segs], self.len_sq[segs]
+        t = ((px - ax) * dx + (py - ay) * dy) / len_sq
+        np.clip(t, 0.0, 1.0, out=t)
+        ex = ax + t * dx - px
+        ey = ay + t * dy - py
+        d2 = ex * ex + ey * ey
+        k = int(d2.argmin())
+        ti = float(t[k])
+        dist = math.sqrt(float(d2[k]))
+        i = k if segs is None else (segs.start or 0) + k
+        return i, ti, float(self.cum[i] + ti * self.seg_len[i]), dist
+
+    def snap_many(self, px: np.ndarray, py: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """snap() for many points at once: (distance along route m, perpendicular distance m) per point.
+
+        Evaluates a points × segments matrix, so meant for load-time batches
+        such as a route's stops rather than unbounded inputs.
+        """
+        px = px[:, None]
+        py = py[:, None]
+        t = ((px - self.ax) * self.dx + (py - self.ay) * self.dy) / self.len_sq
+        np.clip(t, 0.0, 1.0, out=t)
+        ex = self.ax + t * self.dx - px
+        ey = self.ay + t * self.dy - py
+        d2 = ex * ex + ey * ey
+        k = d2.argmin(axis=1)
+        rows = np.arange(len(k))
+        along = self.cum[k] + t[rows, k] * self.seg_len[k]
+        return along, np.sqrt(d2[rows, k])
+
+    def point_at(self, along_m: float) -> tuple[float, float]:
+        """Projected (x, y) at a distance along the route, clamped to its ends."""
+        i = int(np.searchsorted(self.cum, along_m, side="right")) - 1
+        i = min(max(i, 0), len(self.cum) - 1)
+        seg = float(self.seg_len[i])
+        t = min(max((along_m - float(self.cum[i])) / seg, 0.0), 1.0) if seg > 0 else 0.0
+        return float(self.ax[i] + t * self.dx[i]), float(self.ay[i] + t * self.dy[i])
 
 
 class RouteMatcher:
     """Matches GPS coordinates to pre-loaded route geometries."""
 
     def __init__(self) -> None:
-        # route_id -> (LineString in degrees, total_length_m)
-        self._routes: dict[int, tuple[LineString, float]] = {}
+        self._routes: dict[int, _RouteGeometry] = {}
 
     def load_route(self, route_id: int, coords: list[list[float]]) -> None:
         """Load route geometry. coords = [[lat, lon], ...]"""
         if len(coords) < 2:
             return
-        # Shapely uses (x, y) = (lon, lat)
-        line = LineString([(c[1], c[0]) for c in coords])
-        # Approximate total length in meters
-        total_m = self._line_length_meters(coords)
-        self._routes[route_id] = (line, total_m)
-
-    def match(self, route_id: int, lat: float, lon: float, course: float | None = 0.0) -> MatchResult | None:
-        """Snap a point to a route, returning progress and distance."""
-        if route_id not in self._routes:
+        self._routes[route_id] = _RouteGeometry.from_coords(coords)
+
+    def match(
+        self, route_id: int, lat: float, lon: float, course: float | None = 0.0,
+        hint_seg: int | None = None,
+    ) -> MatchResult | None:
+        """Snap a point to a route, returning progress and distance.
+
+        `hint_seg` is the segment of the vehicle's previous match; the search
+        then starts around it instead of scanning the whole route.
+        """
+        geom = self._routes.get(route_id)
+        if geom is None:
             return None
 
-        line, total_m = self._routes[route_id]
-        point = Point(lon, lat)
-
-        # Project point onto line (normalized 0.0–1.0)
-        progress = line.project(point, normalized=True)
-
-        # Distance from point to line (in degrees, convert to meters)
-        dist_deg = line.distance(point)
-        dist_m = dist_deg * LON_M_PER_DEG  # rough conversion
-
+        px, py = lon * LON_M_PER_DEG, lat * LAT_M_PER_DEG
+        if hint_seg is None:
+            seg, _, along_m, dist_m = geom.snap(px, py)
+        else:
+            seg, _, along_m, dist_m = self._snap_near(geom, px, py, hint_seg)
         if dist_m > MAX_SNAP_DISTANCE_M:
             return None
 
+        # Progress along the line (0.0–1.0)
+        progress = along_m / geom.total_m if geom.total_m > 0 else 0.0
+
         # Determine direction from course heading
-        direction = self._infer_direction(line, progress, course)
+        direction = self._infer_direction(geom, seg, progress, course)
+
+        return MatchResult(progress=progress, distance_m=dist_m, direction=direction, segment=seg)
 
-        return MatchResult(progress=progress, distance_m=dist_m, direction=direction)
+    @staticmethod
+    def _snap_near(geom: _RouteGeometry, px: float, py: float, hint: int) -> tuple[int, float, float, float]:
+        """Snap searching outward from segment `hint`.
+
+        The window doubles while the best segment sits on its edge; a result
+        still far from the line falls back to a full scan.
+        """
+        n = len(geom.ax)
+        hint = min(max(hint, 0), n - 1)
+        w = HINT_WINDOW
+        while True:
+            lo, hi = max(0, hint - w), min(n, hint + w + 1)
+            res = geom.snap(px, py, slice(lo, hi))
+            i = res[0]
+            if (i > lo or lo == 0) and (i < hi - 1 or hi == n):
+                break
+            w *= 2
+        if res[3] > HINT_MAX_DIST_M:
+            return geom.snap(px, py)
+        return res
+
+    def progress_many(
+        self, route_id: int, lats: np.ndarray, lons: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        """Snap many points to a route: (progress 0..1, distance_m) arrays.
+
+        Unlike match(), points beyond MAX_SNAP_DISTANCE_M are not filtered;
+        callers apply their own threshold to distance_m.
+        """
+        geom = self._routes.get(route_id)
+        if geom is None:
+            return None
+        along_m, dist_m = geom.snap_many(
+            np.asarray(lons, dtype=np.float64) * LON_M_PER_DEG,
+            np.asarray(lats, dtype=np.float64) * LAT_M_PER_DEG,
+        )
+        progress = along_m / geom.total_m if geom.total_m > 0 else np.zeros_like(along_m)
+        return progress, dist_m
 
     def get_distance_at_progress(self, route_id: int, progress: float) -> float:
         """Get distance in meters along route at given progress."""
         if route_id not in self._routes:
             return 0.0
-        _, total_m = self._routes[route_id]
-        return progress * total_m
+        return progress * self._routes[route_id].total_m
 
     def get_total_length(self, route_id: int) -> float:
         if route_id not in self._routes:
             return 0.0
-        return self._routes[route_id][1]
+        return self._routes[route_id].total_m
 
     def interpolate_progress(self, route_id: int, progress: float) -> tuple[float, float] | None:
         """Return (lat, lon) at given progress (0.0–1.0) along the route."""
-        if route_id not in self._routes:
+        geom = self._routes.get(route_id)
+        if geom is None:
             return None
-        line, _ = self._routes[route_id]
-        pt = line.interpolate(max(0.0, min(1.0, progress)), normalized=True)
-        return (pt.y, pt.x)  # (lat, lon)
+        x, y = geom.point_at(max(0.0, min(1.0, progress)) * geom.total_m)
+        return (y / LAT_M_PER_DEG, x / LON_M_PER_DEG)
 
-    def _infer_direction(self, line: LineString, progress: float, course: float | None) -> int:
-        """Compare vehicle heading with route bearing to infer direction."""
+    @staticmethod
+    def _infer_direction(geom: _RouteGeometry, seg: int, progress: float, course: float | None) -> int:
+        """Compare vehicle heading with the route bearing at segment `seg`."""
         if progress < 0.01 or progress > 0.99:
             return 0
-        # Get route bearing at this progress point
-        p1 = line.interpolate(max(0, progress - 0.005), normalized=True)
-        p2 = line.interpolate(min(1, progress + 0.005), normalized=True)
-        route_bearing = math.degrees(math.atan2(p2.x - p1.x, p2.y - p1.y)) % 360
-
         # Compare with vehicle course; if unknown keep default forward direction.
         if course is None:
             return 0
-        diff = abs(course - route_bearing) % 360
+        diff = abs(course - float(geom.bearing[seg])) % 360
         if diff > 180:
             diff = 360 - diff
 
         # If course is roughly opposite to route direction, vehicle goes reverse
         return 1 if diff > 90 else 0
-
-    @staticmethod
-    def _line_length_meters(coords: list[list[float]]) -> float:
-        """Approximate length of a polyline in meters."""
-        total = 0.0
-        for i in range(1, len(coords)):
-            dlat = (coords[i][0] - coords[i - 1][0]) * LAT_M_PER_DEG
-            dlon = (coords[i][1] - coords[i - 1][1]) * LON_M_PER_DEG
-            total += math.sqrt(dlat * dlat + dlon * dlon)
-        return total
@@ -9,48 +9,59 @@ import logging
 import math
 from dataclasses import dataclass
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # Approximate meters per degree at Yekaterinburg latitude (~56.8)
 _LAT_M = 111_320.0
 _LON_M = 111_320.0 * math.cos(math.radians(56.84))
 
+# Stops scanned either side of a hinted index before falling back to a full scan
+_HINT_WINDOW = 5
+
+
+def _project(lat: float, lon: float) -> complex:
+    """GPS point in the local projected frame (meters), as x + iy."""
+    return complex(lon * _LON_M, lat * _LAT_M)
+
+
+@dataclass(slots=True)
+class _StopSequence:
+    """One route direction: stops in ETTU order plus aligned arrays in projected meters."""
+    stops: list["StopOnRoute"]
+    # Positions as complex x + iy: each distance is then one np.abs (hypot)
+    # pass in C instead of separate x/y subtract-square-add passes
+    z: np.ndarray
+    cum: np.ndarray  # cumulative_distance_m
+    # Segment i runs from stop i to stop i+1
+    dz: np.ndarray
+    dz_conj: np.ndarray  # (p - z) * dz_conj has the projection dot product as its real part
+    len_sq: np.ndarray  # clamped away from zero for degenerate segments
+    # Segment lengths as Python floats: _locate reads two per call, and list
+    # indexing is cheaper than recomputing them from the positions
+    seg_len: list[float]
+    # Per stop: bearing (degrees clockwise from north) of the segment leaving
+    # it; the last stop repeats the final segment's
+    bearing: np.ndarray
 
-def _gps_dist_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Distance in meters between two GPS points (flat-earth approximation)."""
-    dlat = (lat2 - lat1) * _LAT_M
-    dlon = (lon2 - lon1) * _LON_M
-    return math.sqrt(dlat * dlat + dlon * dlon)
-
-
-def _point_to_segment_dist_sq(
-    plat: float, plon: float,
-    alat: float, alon: float,
-    blat: float, blon: float,
-) -> float:
-    """Squared distance (m²) from a point to a line segment."""
-    px, py = plon * _LON_M, plat * _LAT_M
-    ax, ay = alon * _LON_M, alat * _LAT_M
-    bx, by = blon * _LON_M, blat * _LAT_M
-    dx, dy = bx - ax, by - ay
-    len_sq = dx * dx + dy * dy
-    if len_sq < 1e-6:  # degenerate segment
-        dx, dy = px - ax, py - ay
-        return dx * dx + dy * dy
-    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / len_sq))
-    cx, cy = ax + t * dx, ay + t * dy
-    dx, dy = px - cx, py - cy
-    return dx * dx + dy * dy
-
-
-def _segment_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Bearing in degrees from point 1 to point 2."""
-    dx = (lon2 - lon1) * _LON_M
-    dy = (lat2 - lat1) * _LAT_M
-    return math.degrees(math.atan2(dx, dy)) % 360
-
-
-@dataclass
+    @classmethod
+    def build(cls, stops: list["StopOnRoute"]) -> "_StopSequence":
+        z = np.fromiter(
+            (complex(s.lon * _LON_M, s.lat * _LAT_M) for s in stops), dtype=np.complex128, count=len(stops),
+        )
+        dz = np.diff(z)
+        seg_len = np.abs(dz)
+        cum = np.zeros(len(z))
+        np.cumsum(seg_len, out=cum[1:])
+        bearing = np.degrees(np.arctan2(dz.real, dz.imag)) % 360
+        bearing = np.append(bearing, bearing[-1:])
+        return cls(
+            stops, z, cum, dz, dz.conj(), np.maximum(seg_len * seg_len, 1e-6), seg_len.tolist(), bearing,
+        )
+
+
+@dataclass(slots=True)
 class StopOnRoute:
     stop_id: int
     name: str
@@ -61,19 +72,26 @@ class StopOnRoute:
     cumulative_distance_m: float = 0.0  # filled by load_route_stops
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DetectionResult:
     prev_stop: StopOnRoute | None
     next_stops: list[StopOnRoute]
     direction: int = 0
+    # cumulative_distance_m of next_stops (view into the cached per-direction array)
+    next_cumulative_m: np.ndarray | None = None
+    # Vehicle position projected onto the prev→next stop segment, meters from
+    # the first stop of the direction (same frame as cumulative_distance_m)
+    distance_along_m: float = 0.0
+    # Index of prev_stop within its direction; pass back as hint_idx next tick
+    prev_index: int | None = None
 
 
 class StopDetector:
     """Finds prev/next stops by GPS proximity to the ETTU-defined stop sequence."""
 
     def __init__(self) -> None:
-        # route_id -> {direction -> [StopOnRoute sorted by order]}
-        self._stops: dict[int, dict[int, list[StopOnRoute]]] = {}
+        # route_id -> {direction -> stops sorted by order, with projected arrays}
+        self._stops: dict[int, dict[int, _StopSequence]] = {}
 
     def load_route_stops(self, route_id: int, stops: list[StopOnRoute]) -> None:
         """Load stops organized by direction, sorted by order, with cumulative distances."""
@@ -81,17 +99,14 @@ class StopDetector:
         for s in stops:
             by_dir.setdefault(s.direction, []).append(s)
 
-        for d in by_dir:
-            by_dir[d].sort(key=lambda x: x.order)
-            # Compute cumulative GPS distances along the stop sequence
-            cum = 0.0
-            for i, s in enumerate(by_dir[d]):
-                if i > 0:
-                    prev = by_dir[d][i - 1]
-                    cum += _gps_dist_m(prev.lat, prev.lon, s.lat, s.lon)
-                s.cumulative_distance_m = cum
-
-        self._stops[route_id] = by_dir
+        seqs: dict[int, _StopSequence] = {}
+        for d, sl in by_dir.items():
+            sl.sort(key=lambda x: x.order)
+            seqs[d] = _StopSequence.build(sl)
+            for s, c in zip(sl, seqs[d].cum.tolist()):
+                s.cumulative_distance_m = c
+
+        self._stops[route_id] = seqs
         total_dirs = {d: len(sl) for d, sl in by_dir.items()}
         logger.debug("Route %d: loaded stops by direction: %s", route_id, total_dirs)
 
@@ -106,47 +121,79 @@ class StopDetector:
         equal probes placed toward previous and next stops. This decides whether the
         vehicle is before stop, after stop, or effectively at stop.
         """
-        if route_id not in self._stops:
+        seqs = self._stops.get(route_id)
+        if seqs is None:
             return DetectionResult(prev_stop=None, next_stops=[], direction=0)
 
-        best: DetectionResult | None = None
+        p = _project(lat, lon)
+        best_d: int | None = None
+        best_seq: _StopSequence | None = None
+        best_closest = 0
         best_score = float("inf")
 
-        for d, stops in self._stops[route_id].items():
-            if not stops:
+        for d, seq in seqs.items():
+            n = len(seq.stops)
+            if not n:
                 continue
 
-            closest_idx, closest_dist = self._find_nearest_stop(stops, lat, lon)
-            score = closest_dist * closest_dist
-
-            # Course-based penalty against route direction near closest stop.
-            if course is not None and len(stops) > 1:
-                seg_from = max(0, min(closest_idx, len(stops) - 2))
-                seg_bear = _segment_bearing(
-                    stops[seg_from].lat, stops[seg_from].lon,
-                    stops[seg_from + 1].lat, stops[seg_from + 1].lon,
-                )
-                diff = abs(course - seg_bear) % 360
-                if diff > 180:
-                    diff = 360 - diff
-                if diff > 90:
-                    score += 500_000
-
-            if preferred_direction is not None and d != preferred_direction:
-                score += 200_000
+            closest_idx, score = self._find_nearest_stop(seq, p)
 
-            prev_idx = self._infer_prev_stop_index(stops, closest_idx, lat, lon)
-            next_list = stops[prev_idx + 1: prev_idx + 1 + max_next]
+            # Course-based penalty against route direction near closest stop:
+            # heading more than 90° off the segment bearing means cos < 0.
+            if course is not None and n > 1:
+                seg_bear = float(seq.bearing[closest_idx])
+                score += 500_000 * (math.cos(math.radians(course - seg_bear)) < 0)
+            if preferred_direction is not None:
+                score += 200_000 * (d != preferred_direction)
 
             if score < best_score:
-                best_score = score
-                best = DetectionResult(
-                    prev_stop=stops[prev_idx] if stops else None,
-                    next_stops=next_list,
-                    direction=d,
-                )
+                best_score, best_d, best_seq, best_closest = score, d, seq, closest_idx
 
-        return best or DetectionResult(prev_stop=None, next_stops=[], direction=0)
+        if best_seq is None:
+            return DetectionResult(prev_stop=None, next_stops=[], direction=0)
+        return self._result(best_seq, best_d, *self._locate(best_seq, best_closest, p), max_next)
+
+    def detect_batch(
+        self, route_id: int, lats: np.ndarray, lons: np.ndarray,
+        courses: np.ndarray | None = None, max_next: int = 5,
+        preferred_directions: np.ndarray | None = None,
+    ) -> list[DetectionResult]:
+        """detect() for many vehicles on one route at once.
+
+        Nearest stops and direction scores are computed for all vehicles with
+        one broadcast (vehicles × stops) pass per direction. `courses` uses NaN
+        and `preferred_directions` uses -1 where unknown. The probe step then
+        runs per vehicle on its winning direction only.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        seqs = [(d, seq) for d, seq in self._stops.get(route_id, {}).items() if seq.stops]
+        if not seqs:
+            return [DetectionResult(prev_stop=None, next_stops=[], direction=0) for _ in range(len(lats))]
+
+        ps = lons * _LON_M + 1j * (lats * _LAT_M)
+        rows = np.arange(len(ps))
+        scores = np.empty((len(seqs), len(ps)))
+        closest = np.empty((len(seqs), len(ps)), dtype=np.intp)
+        for k, (d, seq) in enumerate(seqs):
+            dist = np.abs(seq.z[None, :] - ps[:, None])
+            idx = dist.argmin(axis=1)
+            score = dist[rows, idx] ** 2
+            if courses is not None and len(seq.stops) > 1:
+                # NaN course compares False: no penalty, as with course=None
+                score += 500_000 * (np.cos(np.radians(courses - seq.bearing[idx])) < 0)
+            if preferred_directions is not None:
+                score += 200_000 * ((preferred_directions >= 0) & (preferred_directions != d))
+            scores[k] = score
+            closest[k] = idx
+
+        # argmin keeps the first direction on ties, like detect()'s strict <
+        best = scores.argmin(axis=0)
+        results = []
+        for v, (k, c) in enumerate(zip(best.tolist(), closest[best, rows].tolist())):
+            d, seq = seqs[k]
+            results.append(self._result(seq, d, *self._locate(seq, c, complex(ps[v])), max_next))
+        return results
 
     def detect_in_direction(
         self,
@@ -155,118 +202,134 @@ class StopDetector:
         lat: float,
         lon: float,
         max_next: int = 5,
+        hint_idx: int | None = None,
     ) -> DetectionResult:
-        """Find prev/next stops for a fixed direction (no cross-direction scoring)."""
-        stops = self._stops.get(route_id, {}).get(direction, [])
-        if not stops:
+        """Find prev/next stops for a fixed direction (no cross-direction scoring).
+
+        `hint_idx` (the previous tick's prev_index) limits the nearest-stop
+        search to a window around it.
+        """
+        seq = self._stops.get(route_id, {}).get(direction)
+        if seq is None or not seq.stops:
             return DetectionResult(prev_stop=None, next_stops=[], direction=direction)
 
-        closest_idx, _ = self._find_nearest_stop(stops, lat, lon)
-        prev_idx = self._infer_prev_stop_index(stops, closest_idx, lat, lon)
-        next_list = stops[prev_idx + 1: prev_idx + 1 + max_next]
-        prev_stop = stops[prev_idx] if stops else None
-        return DetectionResult(prev_stop=prev_stop, next_stops=next_list, direction=direction)
+        p = _project(lat, lon)
+        closest_idx, _ = self._find_nearest_stop(seq, p, hint_idx)
+        return self._result(seq, direction, *self._locate(seq, closest_idx, p), max_next)
+
+    def get_directions(self, route_id: int) -> list[int]:
+        """Directions with loaded stops for a route."""
+        return list(self._stops.get(route_id, {}))
+
+    def get_direction_stops(self, route_id: int, direction: int) -> list[StopOnRoute]:
+        """Stops of one route direction in ETTU order."""
+        seq = self._stops.get(route_id, {}).get(direction)
+        return seq.stops if seq is not None else []
+
+    @staticmethod
+    def _result(
+        seq: _StopSequence, direction: int, prev_idx: int, distance_along_m: float, max_next: int,
+    ) -> DetectionResult:
+        return DetectionResult(
+            prev_stop=seq.stops[prev_idx],
+            next_stops=seq.stops[prev_idx + 1: prev_idx + 1 + max_next],
+            direction=direction,
+            next_cumulative_m=seq.cum[prev_idx + 1: prev_idx + 1 + max_next],
+            distance_along_m=distance_along_m,
+            prev_index=prev_idx,
+        )
 
     # ------------------------------------------------------------------
 
     @staticmethod
-    def _find_nearest_stop(stops: list[StopOnRoute], lat: float, lon: float) -> tuple[int, float]:
-        if not stops:
+    def _find_nearest_stop(seq: _StopSequence, p: complex, hint_idx: int | None = None) -> tuple[int, float]:
+        """Return (index, squared_distance_m) of the stop nearest to projected point `p`.
+
+        With `hint_idx`, only stops within _HINT_WINDOW of it are scanned; a
+        minimum on the window edge may continue outside, so that falls back to
+        the full scan.
+        """
+        n = len(seq.z)
+        if n == 0:
             return 0, float("inf")
-        best_idx = 0
-        best_dist = float("inf")
-        for i, s in enumerate(stops):
-            d = _gps_dist_m(lat, lon, s.lat, s.lon)
-            if d < best_dist:
-                best_dist = d
-                best_idx = i
-        return best_idx, best_dist
+        if hint_idx is not None and n > 2 * _HINT_WINDOW + 1:
+            lo = min(max(hint_idx - _HINT_WINDOW, 0), n - 2 * _HINT_WINDOW - 1)
+            hi = lo + 2 * _HINT_WINDOW + 1
+            d = np.abs(seq.z[lo:hi] - p)
+            i = int(d.argmin())
+            if (i > 0 or lo == 0) and (i < hi - lo - 1 or hi == n):
+                return lo + i, float(d[i]) ** 2
+        d = np.abs(seq.z - p)
+        i = int(d.argmin())
+        return i, float(d[i]) ** 2
 
     @staticmethod
-    def _interp(a: StopOnRoute, b: StopOnRoute, t: float) -> tuple[float, float]:
-        return (a.lat + (b.lat - a.lat) * t, a.lon + (b.lon - a.lon) * t)
-
-    @classmethod
-    def _infer_prev_stop_index(
-        cls,
-        stops: list[StopOnRoute],
-        closest_idx: int,
-        lat: float,
-        lon: float,
-    ) -> int:
-        """Infer whether vehicle is before/at/after nearest stop using equal probes."""
-        if not stops:
-            return 0
-        if len(stops) == 1:
-            return 0
-
-        curr = stops[closest_idx]
-        has_prev = closest_idx > 0
-        has_next = closest_idx < len(stops) - 1
-
-        if not has_prev and has_next:
-            return 0
-        if has_prev and not has_next:
-            return len(stops) - 2
-        if not has_prev and not has_next:
-            return 0
-
-        prev_stop = stops[closest_idx - 1]
-        next_stop = stops[closest_idx + 1]
-        d_prev = _gps_dist_m(curr.lat, curr.lon, prev_stop.lat, prev_stop.lon)
-        d_next = _gps_dist_m(curr.lat, curr.lon, next_stop.lat, next_stop.lon)
-        probe_m = max(5.0, min(d_prev, d_next) * 0.35)
-
-        t_prev = min(1.0, probe_m / max(d_prev, 1e-6))
-        t_next = min(1.0, probe_m / max(d_next, 1e-6))
-        prev_probe = cls._interp(curr, prev_stop, t_prev)
-        next_probe = cls._interp(curr, next_stop, t_next)
-
-        dist_to_prev_probe = _gps_dist_m(lat, lon, prev_probe[0], prev_probe[1])
-        dist_to_next_probe = _gps_dist_m(lat, lon, next_probe[0], next_probe[1])
-        eps = 5.0
-
-        if abs(dist_to_prev_probe - dist_to_next_probe) <= eps:
-            return closest_idx
-        if dist_to_next_probe < dist_to_prev_probe:
-            return closest_idx
-        return max(0, closest_idx - 1)
+    def _locate(seq: _StopSequence, closest_idx: int, p: complex) -> tuple[int, float]:
+        """Return (previous stop index, distance along the sequence m) for a vehicle at `p`.
+
+        Equal probes placed from the nearest stop toward its neighbours decide
+        whether the vehicle is before, at or after it; the vehicle is then
+        projected onto the segment leaving the previous stop. Both steps share
+        one read of the neighbouring positions and work on Python complex
+        scalars.
+        """
+        n = len(seq.z)
+        if n == 1:
+            return 0, 0.0
+        if 0 < closest_idx < n - 1:
+            prev_z, curr, next_z = seq.z[closest_idx - 1: closest_idx + 2].tolist()
+            d_prev = seq.seg_len[closest_idx - 1]
+            d_next = seq.seg_len[closest_idx]
+            probe_m = max(5.0, min(d_prev, d_next) * 0.35)
+
+            t_prev = min(1.0, probe_m / max(d_prev, 1e-6))
+            t_next = min(1.0, probe_m / max(d_next, 1e-6))
+            dist_to_prev_probe = abs(p - (curr + (prev_z - curr) * t_prev))
+            dist_to_next_probe = abs(p - (curr + (next_z - curr) * t_next))
+            eps = 5.0
+
+            # Only a next probe farther by more than eps puts the vehicle
+            # before the stop; near-ties count as "at stop" (after it)
+            if dist_to_next_probe - dist_to_prev_probe > eps:
+                idx, a, b, seg_len = closest_idx - 1, prev_z, curr, d_prev
+            else:
+                idx, a, b, seg_len = closest_idx, curr, next_z, d_next
+        else:
+            # At either end the vehicle is on the first or last segment
+            idx = 0 if closest_idx == 0 else n - 2
+            a, b = seq.z[idx: idx + 2].tolist()
+            seg_len = seq.seg_len[idx]
+
+        start = float(seq.cum[idx])
+        if seg_len < 1e-3:  # degenerate segment
+            return idx, start
+        t = max(0.0, min(1.0, ((p - a) * (b - a).conjugate()).real / (seg_len * seg_len)))
+        return idx, start + t * seg_len
 
     @staticmethod
-    def _find_nearest_segment(
-        stops: list[StopOnRoute], lat: float, lon: float,
-    ) -> tuple[int, float]:
-        """Return (index, squared_distance_m) of the nearest segment.
+    def _find_nearest_segment(seq: _StopSequence, p: complex) -> tuple[int, float]:
+        """Return (index, squared_distance_m) of the segment nearest to projected point `p`.
 
         Index i means the vehicle is between stops[i] and stops[i+1].
         """
-        if len(stops) == 0:
+        n = len(seq.z)
+        if n == 0:
             return 0, float("inf")
-        if len(stops) == 1:
-            dlat = (stops[0].lat - lat) * _LAT_M
-            dlon = (stops[0].lon - lon) * _LON_M
-            return 0, dlat * dlat + dlon * dlon
-
-        best_idx = 0
-        best_dist = float("inf")
-
-        for i in range(len(stops) - 1):
-            dist = _point_to_segment_dist_sq(
-                lat, lon,
-                stops[i].lat, stops[i].lon,
-                stops[i + 1].lat, stops[i + 1].lon,
-            )
-            if dist < best_dist:
-                best_dist = dist
-                best_idx = i
-
-        return best_idx, best_dist
+        if n == 1:
+            return 0, abs(p - complex(seq.z[0])) ** 2
+
+        w = p - seq.z[:-1]  # segment start → vehicle
+        t = (w * seq.dz_conj).real / seq.len_sq
+        np.clip(t, 0.0, 1.0, out=t)
+        d = np.abs(w - t * seq.dz)
+        i = int(d.argmin())
+        return i, float(d[i]) ** 2
 
     def get_all_stops(self, route_id: int) -> list[StopOnRoute]:
         """Get all stops for a route across all directions."""
         if route_id not in self._stops:
             return []
         result = []
-        for stops in self._stops[route_id].values():
-            result.extend(stops)
+        for seq in self._stops[route_id].values():
+            result.extend(seq.stops)
         return result
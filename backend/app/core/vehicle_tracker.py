@@ -2,26 +2,30 @@
 
 import asyncio
 import datetime
-import json
+import itertools
 import logging
 import math
 import time
-from collections import deque
+from collections import deque, namedtuple
+from dataclasses import dataclass
 
 import httpx
+from pydantic import TypeAdapter
 from sqlalchemy import text
 
 from app.core.broadcaster import Broadcaster
 from app.core.eta_calculator import EtaCalculator
-from app.core.ettu_client import EttuClient, RawRoute, RawStop, RawVehicle
+from app.core.ettu_client import ROUTES_PATH, EttuClient, RawRoute, RawRouteStop, RawStop, RawVehicle
 from app.core.route_matcher import RouteMatcher
-from app.core.stop_detector import StopDetector, StopOnRoute
+from app.core.stop_detector import DetectionResult, StopDetector, StopOnRoute
 from app.schemas.vehicle import VehicleState, NextStopInfo, StopInfo
 
 logger = logging.getLogger(__name__)
 
 OSRM_BASE = "https://router.project-osrm.org"
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+# Max OSRM geometry requests in flight while loading routes
+OSRM_CONCURRENCY = 4
 # Bounding box for Ekaterinburg tram network (south,west,north,east)
 EKB_BBOX = "56.7,60.4,56.95,60.8"
 
@@ -29,6 +33,10 @@ EKB_BBOX = "56.7,60.4,56.95,60.8"
 LAT_M_PER_DEG = 111_320.0
 LON_M_PER_DEG = 111_320.0 * math.cos(math.radians(56.84))
 
+# Serializes state lists straight to JSON bytes in pydantic's core, without
+# building model_dump() dicts first
+_STATES_JSON = TypeAdapter(list[VehicleState])
+
 
 def _stop_display_name(name: str, direction: str) -> str:
     """Combine stop name with direction label, e.g. '1-й км (на Пионерскую)'."""
@@ -37,6 +45,16 @@ def _stop_display_name(name: str, direction: str) -> str:
     return name
 
 
+# Route path entry joined with its stop's name, direction label and coordinates
+ResolvedStop = namedtuple(
+    "ResolvedStop", ("id", "order", "direction", "name", "direction_label", "lat", "lon"),
+)
+
+
+def _resolved_stop(s: RawRouteStop, info: RawStop) -> ResolvedStop:
+    return ResolvedStop(s.id, s.order, s.direction, info.name, info.direction, info.lat, info.lon)
+
+
 def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Distance in meters between two lat/lon points."""
     R = 6_371_000
@@ -48,6 +66,17 @@ def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * 2 * math.asin(math.sqrt(a))
 
 
+@dataclass(slots=True)
+class _SmoothState:
+    """What _process_vehicle keeps about a vehicle for its next poll."""
+    progress: float | None
+    speed: float
+    direction: int
+    route_id: int
+    terminal_distance_m: float | None
+    terminal_min_distance_m: float | None
+
+
 class VehicleTracker:
     """Orchestrates the vehicle tracking pipeline."""
 
@@ -63,6 +92,14 @@ class VehicleTracker:
         self.route_matcher = RouteMatcher()
         self.stop_detector = StopDetector()
         self.eta_calculator = EtaCalculator()
+        # Shared client for OSRM and Overpass: keeps connections alive across
+        # the per-route OSRM requests made while loading routes
+        self._http = httpx.AsyncClient(
+            timeout=10.0,
+            verify=False,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
 
         # route_num -> route_id mapping
         self._route_num_to_id: dict[str, int] = {}
@@ -88,13 +125,14 @@ class VehicleTracker:
 
         # Current vehicle states (vehicle_id -> VehicleState)
         self.current_states: dict[str, VehicleState] = {}
+        # Secondary index of current_states: route number -> {vehicle_id -> VehicleState}
+        self._states_by_route: dict[str, dict[str, VehicleState]] = {}
 
-        # Per-vehicle smoothing state for progress and speed
-        self._smooth: dict[str, dict] = {}
-        # {vehicle_id: {"progress": float | None, "speed": float, "direction": int, "route_id": int}}
+        # Per-vehicle state carried between polls: vehicle_id -> _SmoothState
+        self._smooth: dict[str, _SmoothState] = {}
 
-        # Recent GPS positions for bearing calculation (last 3 points)
-        self._recent_positions: dict[str, list[tuple[float, float]]] = {}
+        # Recent GPS positions for bearing calculation (last 5 points)
+        self._recent_positions: dict[str, deque[tuple[float, float]]] = {}
 
         # Per-vehicle stop passage tracking for travel time recording
         # {vehicle_id: {"stop_id": int, "route_id": int, "time": datetime}}
@@ -105,6 +143,10 @@ class VehicleTracker:
         # Full next-stops list per vehicle (for station arrival queries)
         # vehicle_id -> [StopOnRoute] (all remaining stops, not just first 5)
         self._vehicle_all_next_stops: dict[str, list[StopOnRoute]] = {}
+        # Latest stop detection per vehicle (position along stops + cumulative distances)
+        self._vehicle_detection: dict[str, DetectionResult] = {}
+        # Last route-matched segment per vehicle: vehicle_id -> (route_id, segment index)
+        self._match_segment: dict[str, tuple[int, int]] = {}
 
         # Per-vehicle data age (seconds since ATIME) for ETA correction in arrivals
         self._vehicle_data_age: dict[str, float] = {}
@@ -120,23 +162,38 @@ class VehicleTracker:
         # Diagnostics: track unresolved stop IDs per route
         self._diag_unresolved: dict[int, list[int]] = {}  # route_id -> [stop_ids not in points]
         self._diag_total_path_stops: dict[int, int] = {}  # route_id -> total path entries
-        self._projection_events: deque[dict] = deque(maxlen=500)
+        # Ring of (unix time, kind, payload); dicts are built when read
+        self._projection_events: deque[tuple[float, str, dict]] = deque(maxlen=500)
+
+        # Bumped whenever routes or vehicle states change; keys derived caches.
+        self._state_version: int = 0
+        # Cached get_diagnostics() result: (state_version, built_monotonic, diag, {route_id: route_diag})
+        self._diag_cache: tuple[int, float, dict, dict[int, dict]] | None = None
+        # Serialized current_states for /api/vehicles: (state_version, json bytes)
+        self._states_json_cache: tuple[int, bytes] | None = None
+
+        # Bumped after each route/stop reload; keys the catalog endpoint caches.
+        self.catalog_version: int = 0
+        # Serialized /api/routes, /api/stops bodies: key -> (catalog_version, etag, body)
+        self._catalog_json: dict[str, tuple[int, str, bytes]] = {}
 
     # Cache TTL constants
     STOPS_CACHE_TTL = 7 * 86400  # 7 days for stops (rarely change)
     ROUTES_CACHE_TTL = 86400  # 24 hours for routes
 
+    async def close(self) -> None:
+        await self._http.aclose()
+
     async def load_routes_and_stops(self) -> None:
         """Fetch and load routes and stops from ETTU API (or DB cache) into matchers."""
-        routes = await self.ettu.fetch_routes()
-
-        # Try cached stops from DB; only fetch from ETTU if stale (>7 days) or empty
-        stops = await self._load_cached_stops()
+        # Routes come from ETTU, stops from the DB cache when fresh (>7 days
+        # stale or empty -> ETTU); the two lookups are independent, so overlap them
+        routes, stops = await asyncio.gather(self._fetch_routes(), self._load_cached_stops())
         if not stops:
             stops = await self.ettu.fetch_stops()
 
         # Try cached OSM geometries first; fetch fresh if cache is stale (>24h)
-        osm_geometries = await self._load_cached_geometries()
+        osm_geometries = await self._load_cached_geometries([r.number for r in routes])
         if not osm_geometries:
             osm_geometries = await self._fetch_osm_geometries()
             if osm_geometries:
@@ -152,37 +209,32 @@ class VehicleTracker:
             if s.direction:
                 self._stop_directions[s.id] = s.direction
 
+        # route_id -> (path stops, geometry stops) joined with the stop list;
+        # the RawRoute entries themselves are left untouched
+        resolved: dict[int, tuple[list[ResolvedStop], list[ResolvedStop]]] = {}
+
         for route in routes:
             self._route_num_to_id[route.number] = route.id
             self._route_id_to_num[route.id] = route.number
 
             # Resolve stop coordinates from the global stop list
-            resolved_stops = []
+            resolved_stops: list[ResolvedStop] = []
             unresolved_ids = []
             total_path = len(route.stops)
             for s in route.stops:
-                stop_info = stop_lookup.get(s["id"])
+                stop_info = stop_lookup.get(s.id)
                 if stop_info:
-                    s["name"] = stop_info.name
-                    s["direction_label"] = stop_info.direction
-                    s["lat"] = stop_info.lat
-                    s["lon"] = stop_info.lon
-                    resolved_stops.append(s)
+                    resolved_stops.append(_resolved_stop(s, stop_info))
                 else:
-                    unresolved_ids.append(s["id"])
-            route.stops = resolved_stops
+                    unresolved_ids.append(s.id)
 
             # Resolve geometry stops (used for route line rendering)
-            resolved_geom = []
-            for s in route.geometry_stops:
-                stop_info = stop_lookup.get(s["id"])
-                if stop_info:
-                    s["name"] = stop_info.name
-                    s["direction_label"] = stop_info.direction
-                    s["lat"] = stop_info.lat
-                    s["lon"] = stop_info.lon
-                    resolved_geom.append(s)
-            route.geometry_stops = resolved_geom
+            geometry_stops = [
+                _resolved_stop(s, stop_info)
+                for s in route.geometry_stops
+                if (stop_info := stop_lookup.get(s.id))
+            ]
+            resolved[route.id] = (resolved_stops, geometry_stops)
             self._diag_total_path_stops[route.id] = total_path
             if unresolved_ids:
                 self._diag_unresolved[route.id] = unresolved_ids
@@ -193,28 +245,45 @@ class VehicleTracker:
 
             # Build stop-route association
             named_ids = set()
-            for s in route.stops:
-                self._stop_to_routes.setdefault(s["id"], set()).add(route.id)
-                if s["name"]:
-                    named_ids.add(s["id"])
+            for s in resolved_stops:
+                self._stop_to_routes.setdefault(s.id, set()).add(route.id)
+                if s.name:
+                    named_ids.add(s.id)
             self._route_stop_ids[route.id] = list(named_ids)
 
+        # Routes without OSM geometry fall back to OSRM: fetch those
+        # concurrently, bounded to stay polite to the public server
+        osrm_sem = asyncio.Semaphore(OSRM_CONCURRENCY)
+
+        async def fetch_osrm(route: RawRoute) -> list[list[float]] | None:
+            async with osrm_sem:
+                path_stops, geometry_stops = resolved[route.id]
+                return await self._fetch_osrm_geometry(geometry_stops or path_stops)
+
+        osrm_routes = [r for r in routes if not osm_geometries.get(r.number)]
+        osrm_geometries = dict(zip(
+            (r.id for r in osrm_routes),
+            await asyncio.gather(*(fetch_osrm(r) for r in osrm_routes)),
+        ))
+
+        for route in routes:
+            path_stops, geometry_stops = resolved[route.id]
             # Route geometry priority: OSM > OSRM > stop-to-stop lines
             osm_geom = osm_geometries.get(route.number)
             if osm_geom:
                 route.points = osm_geom
                 logger.debug("Route %s: using OSM geometry (%d pts)", route.number, len(osm_geom))
             else:
-                geom_src = route.geometry_stops or route.stops
-                osrm_geom = await self._fetch_osrm_geometry(geom_src)
+                geom_src = geometry_stops or path_stops
+                osrm_geom = osrm_geometries.get(route.id)
                 if osrm_geom:
                     route.points = osrm_geom
                     logger.debug("Route %s: using OSRM geometry", route.number)
                 elif not route.points and geom_src:
                     route.points = [
-                        [s["lat"], s["lon"]]
+                        [s.lat, s.lon]
                         for s in geom_src
-                        if s["lat"] != 0 and s["lon"] != 0
+                        if s.lat != 0 and s.lon != 0
                     ]
                     logger.debug("Route %s: using stop-to-stop fallback", route.number)
 
@@ -223,39 +292,42 @@ class VehicleTracker:
                 self._route_geometries[route.id] = route.points
                 self.route_matcher.load_route(route.id, route.points)
 
-                # Precompute stop progress on geometry for section-bound checks.
+                # Precompute stop progress on geometry for section-bound checks,
+                # snapping all of the route's stops in one batch.
                 stop_prog: dict[int, float] = {}
-                for s in route.stops:
-                    if s["lat"] == 0 or s["lon"] == 0:
-                        continue
-                    m = self.route_matcher.match(route.id, s["lat"], s["lon"], 0.0)
-                    if m and m.distance_m <= 120:
-                        stop_prog[s["id"]] = m.progress
+                located = [s for s in path_stops if s.lat != 0 and s.lon != 0]
+                snapped = self.route_matcher.progress_many(
+                    route.id, [s.lat for s in located], [s.lon for s in located],
+                )
+                if located and snapped is not None:
+                    for s, prog, dist_m in zip(located, snapped[0].tolist(), snapped[1].tolist()):
+                        if dist_m <= 120:
+                            stop_prog[s.id] = prog
                 self._route_stop_progress[route.id] = stop_prog
 
             # Load stops for this route (only named stops for the detector).
             # No geometry projection needed — the detector uses GPS distances
             # and ETTU stop ordering directly.
             route_stops = []
-            for s in route.stops:
-                if not s["name"]:
+            for s in path_stops:
+                if not s.name:
                     continue  # Skip unnamed stops – they show as blank in popups
                 route_stops.append(StopOnRoute(
-                    stop_id=s["id"],
-                    name=_stop_display_name(s["name"], s.get("direction_label", "")),
-                    lat=s["lat"],
-                    lon=s["lon"],
-                    order=s["order"],
-                    direction=s["direction"],
+                    stop_id=s.id,
+                    name=_stop_display_name(s.name, s.direction_label),
+                    lat=s.lat,
+                    lon=s.lon,
+                    order=s.order,
+                    direction=s.direction,
                 ))
 
             self.stop_detector.load_route_stops(route.id, route_stops)
 
-            # Small delay between OSRM requests to avoid rate limiting
-            await asyncio.sleep(0.3)
+        self._state_version += 1
 
         # Save to database (only named stops)
         await self._persist_routes_stops(routes, stops)
+        self.catalog_version += 1
         logger.info(
             "Loaded %d routes, %d total stops (%d with geometry)",
             len(routes), len(stops), len(self._route_geometries),
@@ -265,10 +337,62 @@ class VehicleTracker:
         """Get route geometry as [[lat, lon], ...] for API."""
         return self._route_geometries.get(route_id)
 
+    def get_route_geometries_bulk(self, route_ids: list[int]) -> dict[int, list[list[float]]]:
+        """Get geometries for several routes at once (routes without geometry are omitted)."""
+        geoms = self._route_geometries
+        return {rid: geoms[rid] for rid in route_ids if rid in geoms}
+
+    def get_catalog_json(self, key: str) -> tuple[str, bytes] | None:
+        """Cached (etag, body) for a catalog endpoint if still current."""
+        entry = self._catalog_json.get(key)
+        if entry is None or entry[0] != self.catalog_version:
+            return None
+        return entry[1], entry[2]
+
+    def put_catalog_json(self, key: str, version: int, etag: str, body: bytes) -> None:
+        """Cache a catalog endpoint body built while catalog_version was `version`."""
+        self._catalog_json[key] = (version, etag, body)
+
     def get_route_stop_ids(self, route_id: int) -> list[int]:
         """Get named stop IDs for a route."""
         return self._route_stop_ids.get(route_id, [])
 
+    def get_vehicles_json(self, route: str | None = None) -> bytes:
+        """Current vehicle states as JSON bytes, optionally for one route number.
+
+        The unfiltered payload is serialized once per state version.
+        """
+        if route:
+            return _STATES_JSON.dump_json(list(self._states_by_route.get(route, {}).values()))
+        cached = self._states_json_cache
+        if cached is None or cached[0] != self._state_version:
+            cached = (
+                self._state_version,
+                _STATES_JSON.dump_json(list(self.current_states.values())),
+            )
+            self._states_json_cache = cached
+        return cached[1]
+
+    def _set_state(self, state: VehicleState) -> None:
+        """Store a vehicle state, keeping the per-route index in sync."""
+        old = self.current_states.get(state.id)
+        if old is not None and old.route != state.route:
+            self._unindex_state(old)
+        self.current_states[state.id] = state
+        self._states_by_route.setdefault(state.route, {})[state.id] = state
+
+    def _drop_state(self, vehicle_id: str) -> None:
+        old = self.current_states.pop(vehicle_id, None)
+        if old is not None:
+            self._unindex_state(old)
+
+    def _unindex_state(self, state: VehicleState) -> None:
+        by_id = self._states_by_route.get(state.route)
+        if by_id is not None:
+            by_id.pop(state.id, None)
+            if not by_id:
+                del self._states_by_route[state.route]
+
     # How long to keep a vehicle on the map after it disappears from API
     GHOST_TTL_SECONDS = 120  # 2 minutes
 
@@ -300,7 +424,7 @@ class VehicleTracker:
                 if state:
                     state.signal_lost = False
                     states.append(state)
-                    self.current_states[state.id] = state
+                    self._set_state(state)
                     self._vehicle_data_age[state.id] = data_age_s
                     # Use ATIME for last_seen if available (more accurate for ghost detection)
                     self._last_seen[state.id] = rv.atime_utc or now
@@ -321,20 +445,23 @@ class VehicleTracker:
                         states.append(ghost)
                 else:
                     expired.append(vid)
-                    self.current_states.pop(vid, None)
+                    self._drop_state(vid)
                     self._smooth.pop(vid, None)
                     self._recent_positions.pop(vid, None)
                     self._vehicle_all_next_stops.pop(vid, None)
+                    self._vehicle_detection.pop(vid, None)
+                    self._match_segment.pop(vid, None)
 
             for vid in expired:
                 del self._last_seen[vid]
 
+            self._state_version += 1
+
             # Rebuild per-stop arrivals snapshot in background (once per poll cycle).
             self._rebuild_stop_arrivals_snapshot()
 
             # Publish all vehicles (live + ghosts) to subscribers
-            vehicles_data = [s.model_dump() for s in states]
-            await self.broadcaster.publish(vehicles_data)
+            await self.broadcaster.publish(_STATES_JSON.dump_json(states))
 
             # Persist positions and travel times (only if we got data)
             if raw_vehicles:
@@ -369,23 +496,22 @@ class VehicleTracker:
             return state
 
         # Track recent positions for bearing calculation (keep last 5 for better averaging)
-        positions = self._recent_positions.get(rv.dev_id, [])
+        positions = self._recent_positions.get(rv.dev_id)
+        if positions is None:
+            positions = self._recent_positions[rv.dev_id] = deque(maxlen=5)
         positions.append((rv.lat, rv.lon))
-        if len(positions) > 5:
-            positions = positions[-5:]
-        self._recent_positions[rv.dev_id] = positions
 
         # Compute bearing from recent movement
         # Only use movement bearing if the vehicle has actually moved significantly
         movement_bearing = None
-        movement_dist_m = 0.0
+        # Squared meters: only ever compared against thresholds
+        movement_dist_sq = 0.0
         if len(positions) >= 2:
             p_old, p_new = positions[0], positions[-1]
             dlat_m = (p_new[0] - p_old[0]) * LAT_M_PER_DEG
             dlon_m = (p_new[1] - p_old[1]) * LON_M_PER_DEG
-            dist_m = math.sqrt(dlat_m * dlat_m + dlon_m * dlon_m)
-            movement_dist_m = dist_m
-            if dist_m > 30:  # Moved at least 30m — reliable bearing
+            movement_dist_sq = dlat_m * dlat_m + dlon_m * dlon_m
+            if movement_dist_sq > 30 * 30:  # Moved at least 30m — reliable bearing
                 movement_bearing = math.degrees(math.atan2(dlon_m, dlat_m)) % 360
             elif rv.speed > 5:  # API reports moving but GPS jitter hides it
                 movement_bearing = rv.course
@@ -400,10 +526,10 @@ class VehicleTracker:
         prev_direction = None
         prev_terminal_dist_m = None
         prev_terminal_min_dist_m = None
-        if prev and prev.get("route_id") == route_id:
-            prev_direction = prev.get("direction")
-            prev_terminal_dist_m = prev.get("terminal_distance_m")
-            prev_terminal_min_dist_m = prev.get("terminal_min_distance_m")
+        if prev is not None and prev.route_id == route_id:
+            prev_direction = prev.direction
+            prev_terminal_dist_m = prev.terminal_distance_m
+            prev_terminal_min_dist_m = prev.terminal_min_distance_m
 
         if prev_direction is None:
             detection = self.stop_detector.detect(
@@ -413,8 +539,12 @@ class VehicleTracker:
             direction = detection.direction
         else:
             direction = int(prev_direction)
+            # The stored detection is for this route and direction: resume the
+            # nearest-stop search around where the vehicle was last tick
+            last = self._vehicle_detection.get(rv.dev_id)
             detection = self.stop_detector.detect_in_direction(
-                route_id, direction, rv.lat, rv.lon, max_next=200
+                route_id, direction, rv.lat, rv.lon, max_next=200,
+                hint_idx=last.prev_index if last is not None else None,
             )
 
         near_terminal = len(detection.next_stops) <= 1
@@ -422,7 +552,7 @@ class VehicleTracker:
         terminal_min_dist_m = None
 
         if near_terminal:
-            dir_stops = self.stop_detector._stops.get(route_id, {}).get(direction, [])
+            dir_stops = self.stop_detector.get_direction_stops(route_id, direction)
             if dir_stops:
                 terminal = dir_stops[-1]
                 terminal_distance_m = _haversine(rv.lat, rv.lon, terminal.lat, terminal.lon)
@@ -437,7 +567,7 @@ class VehicleTracker:
                     and rv.speed > 3
                 )
                 if departed_terminal:
-                    available_dirs = list(self.stop_detector._stops.get(route_id, {}).keys())
+                    available_dirs = self.stop_detector.get_directions(route_id)
                     alt_dirs = [d for d in available_dirs if d != direction]
                     if alt_dirs:
                         direction = alt_dirs[0]
@@ -450,6 +580,7 @@ class VehicleTracker:
 
         # Store full next stops for station arrival queries
         self._vehicle_all_next_stops[rv.dev_id] = detection.next_stops
+        self._vehicle_detection[rv.dev_id] = detection
 
         if detection.prev_stop:
             state.prev_stop = StopInfo(
@@ -460,8 +591,10 @@ class VehicleTracker:
         # Show up to 5 next stops in vehicle state (for frontend display)
         if detection.next_stops:
             display_stops = detection.next_stops[:5]
+            display_cum = detection.next_cumulative_m
             etas = self.eta_calculator.calculate(
-                rv.lat, rv.lon, smoothed_speed, display_stops
+                detection.distance_along_m, smoothed_speed, display_stops,
+                display_cum[:5] if display_cum is not None else None,
             )
             age_correction = int(data_age_s)
             state.next_stops = [
@@ -479,8 +612,15 @@ class VehicleTracker:
         # wrong, we track progress internally but DON'T send it to the frontend.
         # The frontend will use raw lat/lon from the API instead.
         internal_progress = None
-        match = self.route_matcher.match(route_id, rv.lat, rv.lon, movement_bearing or rv.course)
+        last_seg = self._match_segment.get(rv.dev_id)
+        # Direction is the stateful one from stop detection above, so the
+        # matcher's per-poll heading inference is skipped (course=None)
+        match = self.route_matcher.match(
+            route_id, rv.lat, rv.lon, None,
+            hint_seg=last_seg[1] if last_seg and last_seg[0] == route_id else None,
+        )
         if match:
+            self._match_segment[rv.dev_id] = (route_id, match.segment)
             raw_progress = match.progress
 
             # Section-bound projection check from detected prev/next stops.
@@ -510,8 +650,8 @@ class VehicleTracker:
                         bounded_progress = min(max(raw_progress, lo), hi)
 
             # Enforce forward movement only when we actually observed movement.
-            prev_progress = prev.get("progress") if prev and prev.get("route_id") == route_id else None
-            enforce_forward = movement_dist_m > 20 or rv.speed > 5
+            prev_progress = prev.progress if prev is not None and prev.route_id == route_id else None
+            enforce_forward = movement_dist_sq > 20 * 20 or rv.speed > 5
             if enforce_forward and prev_progress is not None:
                 if direction == 0 and bounded_progress + 0.001 < prev_progress:
                     logger.debug(
@@ -545,39 +685,33 @@ class VehicleTracker:
         # Don't send progress to frontend — it uses raw lat/lon from API
         state.progress = None
 
-        self._smooth[rv.dev_id] = {
-            "progress": internal_progress,
-            "speed": smoothed_speed,
-            # Direction is stateful; switch only after terminal turn-around.
-            "direction": direction,
-            "route_id": route_id,
-            "terminal_distance_m": terminal_distance_m,
-            "terminal_min_distance_m": terminal_min_dist_m,
-        }
+        # Direction is stateful; switch only after terminal turn-around.
+        self._smooth[rv.dev_id] = _SmoothState(
+            internal_progress, smoothed_speed, direction, route_id, terminal_distance_m, terminal_min_dist_m,
+        )
 
         return state
 
     async def _fetch_osrm_geometry(
-        self, stops: list[dict]
+        self, stops: list[ResolvedStop]
     ) -> list[list[float]] | None:
         """Fetch road-snapped geometry from OSRM for forward direction stops."""
         fwd = [s for s in stops
-               if s["direction"] == 0 and s["lat"] != 0 and s["lon"] != 0]
+               if s.direction == 0 and s.lat != 0 and s.lon != 0]
         if len(fwd) < 2:
             return None
 
-        coords = ";".join(f"{s['lon']:.6f},{s['lat']:.6f}" for s in fwd)
+        coords = ";".join(f"{s.lon:.6f},{s.lat:.6f}" for s in fwd)
         url = f"{OSRM_BASE}/route/v1/driving/{coords}?overview=full&geometries=geojson"
 
         try:
-            async with httpx.AsyncClient(timeout=10.0, verify=False) as client:
-                resp = await client.get(url)
-                resp.raise_for_status()
-                data = resp.json()
-                if data.get("code") == "Ok" and data.get("routes"):
-                    geojson = data["routes"][0]["geometry"]["coordinates"]
-                    # Convert [lon, lat] → [lat, lon]
-                    return [[c[1], c[0]] for c in geojson]
+            resp = await self._http.get(url)
+            resp.raise_for_status()
+            data = resp.json()
+            if data.get("code") == "Ok" and data.get("routes"):
+                geojson = data["routes"][0]["geometry"]["coordinates"]
+                # Convert [lon, lat] → [lat, lon]
+                return [[c[1], c[0]] for c in geojson]
         except Exception as e:
             logger.debug("OSRM geometry fetch failed: %s", e)
         return None
@@ -599,14 +733,13 @@ out geom;
         data = None
         for attempt in range(3):
             try:
-                async with httpx.AsyncClient(
+                resp = await self._http.post(
+                    OVERPASS_URL, data={"data": query},
                     timeout=httpx.Timeout(connect=30.0, read=120.0, write=30.0, pool=30.0),
-                    verify=False,
-                ) as client:
-                    resp = await client.post(OVERPASS_URL, data={"data": query})
-                    resp.raise_for_status()
-                    data = resp.json()
-                    break  # Success
+                )
+                resp.raise_for_status()
+                data = resp.json()
+                break  # Success
             except Exception as e:
                 wait = 2 ** (attempt + 1)
                 logger.warning(
@@ -648,28 +781,28 @@ out geom;
         logger.info("Fetched OSM geometries for %d tram routes", len(result))
         return result
 
-    async def _load_cached_geometries(self) -> dict[str, list[list[float]]]:
-        """Load OSM geometries from database cache if fresh (< 24 hours old)."""
+    async def _load_cached_geometries(self, route_numbers: list[str]) -> dict[str, list[list[float]]]:
+        """Load OSM geometries for the given routes from database cache if fresh (< 24 hours old)."""
         result: dict[str, list[list[float]]] = {}
         try:
             async with self.session_factory() as session:
+                # One round-trip: array-bound lookup, freshness evaluated by Postgres
                 rows = await session.execute(
-                    text("SELECT route_number, coords_json, fetched_at FROM route_geometry_cache")
+                    text("""
+                        SELECT route_number, lats, lons,
+                               fetched_at < now() - interval '24 hours' AS stale
+                        FROM route_geometry_cache
+                        WHERE route_number = ANY(CAST(:numbers AS text[]))
+                    """),
+                    {"numbers": route_numbers},
                 )
-                now = datetime.datetime.now(datetime.timezone.utc)
-                stale = False
                 for row in rows:
-                    age = now - row.fetched_at.replace(tzinfo=datetime.timezone.utc)
-                    if age.total_seconds() > 86400:  # 24 hours
-                        stale = True
-                        break
-                    coords = row.coords_json
-                    if isinstance(coords, list) and len(coords) >= 2:
-                        result[row.route_number] = coords
-
-                if stale:
-                    logger.info("OSM geometry cache is stale (>24h), will re-fetch from Overpass")
-                    return {}
+                    if row.stale:
+                        logger.info("OSM geometry cache is stale (>24h), will re-fetch from Overpass")
+                        return {}
+                    if len(row.lats) >= 2 and len(row.lats) == len(row.lons):
+                        result[row.route_number] = [[lat, lon] for lat, lon in zip(row.lats, row.lons)]
+
                 if result:
                     logger.info("Loaded OSM geometries for %d routes from cache", len(result))
         except Exception:
@@ -681,17 +814,26 @@ out geom;
         try:
             async with self.session_factory() as session:
                 now = datetime.datetime.now(datetime.timezone.utc)
-                for route_number, coords in geometries.items():
-                    await session.execute(
-                        text("""
-                            INSERT INTO route_geometry_cache (route_number, coords_json, fetched_at)
-                            VALUES (:rn, CAST(:coords AS jsonb), :now)
-                            ON CONFLICT (route_number) DO UPDATE SET
-                                coords_json = CAST(:coords AS jsonb),
-                                fetched_at = :now
-                        """),
-                        {"rn": route_number, "coords": json.dumps(coords), "now": now},
-                    )
+                # One executemany batch for all routes instead of a round-trip per route
+                await session.execute(
+                    text("""
+                        INSERT INTO route_geometry_cache (route_number, lats, lons, fetched_at)
+                        VALUES (:rn, :lats, :lons, :now)
+                        ON CONFLICT (route_number) DO UPDATE SET
+                            lats = EXCLUDED.lats,
+                            lons = EXCLUDED.lons,
+                            fetched_at = EXCLUDED.fetched_at
+                    """),
+                    [
+                        {
+                            "rn": route_number,
+                            "lats": [c[0] for c in coords],
+                            "lons": [c[1] for c in coords],
+                            "now": now,
+                        }
+                        for route_number, coords in geometries.items()
+                    ],
+                )
                 await session.commit()
                 logger.info("Saved OSM geometries for %d routes to cache", len(geometries))
         except Exception:
@@ -732,6 +874,63 @@ out geom;
             logger.exception("Failed to load stops from database cache")
         return []
 
+    async def _fetch_routes(self) -> list[RawRoute]:
+        """Fetch routes from ETTU, starting from the persisted response after a restart.
+
+        A cached response younger than 24h is used as-is; an older one still
+        primes the client so the refetch is conditional.
+        """
+        if not self._route_id_to_num:
+            try:
+                async with self.session_factory() as session:
+                    result = await session.execute(
+                        text("""
+                            SELECT etag, last_modified, body,
+                                   fetched_at > now() - make_interval(secs => :ttl) AS fresh
+                            FROM ettu_response_cache WHERE path = :path
+                        """),
+                        {"path": ROUTES_PATH, "ttl": self.ROUTES_CACHE_TTL},
+                    )
+                    row = result.first()
+                if row:
+                    routes = await self.ettu.load_routes(row.body, row.etag, row.last_modified)
+                    if routes and row.fresh:
+                        logger.info("Loaded %d routes from database cache", len(routes))
+                        return routes
+            except Exception:
+                logger.exception("Failed to load routes from database cache")
+
+        routes = await self.ettu.fetch_routes()
+        if self.ettu.routes_response is not None:
+            etag, last_modified, body = self.ettu.routes_response
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(
+                        text("""
+                            INSERT INTO ettu_response_cache (path, etag, last_modified, body, fetched_at)
+                            VALUES (:path, :etag, :lm, :body, now())
+                            ON CONFLICT (path) DO UPDATE SET
+                                etag = :etag, last_modified = :lm, body = :body, fetched_at = now()
+                        """),
+                        {"path": ROUTES_PATH, "etag": etag, "lm": last_modified, "body": body},
+                    )
+                    await session.commit()
+            except Exception:
+                logger.exception("Failed to save routes response to database cache")
+        elif self.ettu.routes_not_modified:
+            # The stored body is still current: restart the freshness window so
+            # later restarts take the fresh-cache path again
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(
+                        text("UPDATE ettu_response_cache SET fetched_at = now() WHERE path = :path"),
+                        {"path": ROUTES_PATH},
+                    )
+                    await session.commit()
+            except Exception:
+                logger.exception("Failed to refresh routes response cache timestamp")
+        return routes
+
     async def _update_cache_timestamp(self, cache_key: str) -> None:
         """Update the cache freshness timestamp for a given key."""
         try:
@@ -917,7 +1116,7 @@ out geom;
                 named_stop_ids = {s.id for s in stops if s.name}
                 for r in routes:
                     for s in r.stops:
-                        if s["id"] not in named_stop_ids:
+                        if s.id not in named_stop_ids:
                             continue
                         await session.execute(
                             text("""
@@ -928,9 +1127,9 @@ out geom;
                             """),
                             {
                                 "rid": r.id,
-                                "sid": s["id"],
-                                "dir": s["direction"],
-                                "ord": s["order"],
+                                "sid": s.id,
+                                "dir": s.direction,
+                                "ord": s.order,
                             },
                         )
                 await session.commit()
@@ -938,27 +1137,56 @@ out geom;
             logger.exception("Failed to persist route_stops to database")
 
     def _log_projection_event(self, kind: str, payload: dict) -> None:
-        event = {
-            "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "kind": kind,
-            **payload,
-        }
-        self._projection_events.append(event)
+        self._projection_events.append((time.time(), kind, payload))
 
     def get_projection_diagnostics(self, limit: int = 100) -> dict:
-        events = list(self._projection_events)[-max(1, min(limit, 500)):]
+        n = len(self._projection_events)
+        events = [
+            {
+                "ts": datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat(),
+                "kind": kind,
+                **payload,
+            }
+            for ts, kind, payload in itertools.islice(
+                self._projection_events, max(0, n - max(1, min(limit, 500))), None,
+            )
+        ]
         counts: dict[str, int] = {}
-        for e in self._projection_events:
-            k = e.get("kind", "unknown")
-            counts[k] = counts.get(k, 0) + 1
+        for _, kind, _ in self._projection_events:
+            counts[kind] = counts.get(kind, 0) + 1
         return {
             "events_total": len(self._projection_events),
             "counts": counts,
             "latest": events,
         }
 
+    # Upper bound on how long a diagnostics snapshot is reused
+    DIAGNOSTICS_TTL_SECONDS = 2.0
+
     def get_diagnostics(self) -> dict:
-        """Get pipeline diagnostics for debugging route-stop resolution."""
+        """Get pipeline diagnostics, reusing the last build while state is unchanged."""
+        return self._cached_diagnostics()[0]
+
+    def get_route_diagnostics(self, route_id: int) -> dict | None:
+        """Get diagnostics for a single route (None if unknown)."""
+        return self._cached_diagnostics()[1].get(route_id)
+
+    def _cached_diagnostics(self) -> tuple[dict, dict[int, dict]]:
+        now = time.monotonic()
+        cached = self._diag_cache
+        if (
+            cached is not None
+            and cached[0] == self._state_version
+            and now - cached[1] < self.DIAGNOSTICS_TTL_SECONDS
+        ):
+            return cached[2], cached[3]
+        diag = self._build_diagnostics()
+        by_route = {r["route_id"]: r for r in diag["routes"]}
+        self._diag_cache = (self._state_version, now, diag, by_route)
+        return diag, by_route
+
+    def _build_diagnostics(self) -> dict:
+        """Build pipeline diagnostics for debugging route-stop resolution."""
         route_diags = []
         for route_id, route_num in self._route_id_to_num.items():
             total = self._diag_total_path_stops.get(route_id, 0)
@@ -1023,9 +1251,11 @@ out geom;
                 continue
 
             eta_by_stop: dict[int, int | None] = {}
-            if not state.signal_lost:
+            detection = self._vehicle_detection.get(vid)
+            if not state.signal_lost and detection is not None:
                 calc = self.eta_calculator.calculate(
-                    state.lat, state.lon, state.speed, next_stops
+                    detection.distance_along_m, state.speed, next_stops,
+                    detection.next_cumulative_m,
                 )
                 age = int(self._vehicle_data_age.get(vid, 0))
                 for stop, eta in calc:
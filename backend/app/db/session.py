@@ -2,7 +2,19 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 
 from app.config import settings
 
-engine = create_async_engine(settings.database_url, echo=False, pool_size=10, max_overflow=20)
+engine = create_async_engine(
+    settings.database_url,
+    echo=False,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    connect_args={
+        # SQLAlchemy-side cache of asyncpg prepared statements per connection
+        "prepared_statement_cache_size": 256,
+        # asyncpg's own statement cache
+        "statement_cache_size": 256,
+    },
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
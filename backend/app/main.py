@@ -35,6 +35,37 @@ async def lifespan(app: FastAPI):
         await conn.execute(
             text("ALTER TABLE stops ADD COLUMN IF NOT EXISTS direction VARCHAR(255) NOT NULL DEFAULT ''")
         )
+        # Migrate: geometry cache coords_json -> lats/lons float8[] for databases
+        # built by create_all. Alembic-managed databases (alembic_version
+        # present) are left to revision 003, which does the same conversion.
+        await conn.execute(text("""
+            DO $$ BEGIN
+                IF NOT EXISTS (SELECT 1 FROM information_schema.tables
+                               WHERE table_name = 'alembic_version')
+                   AND EXISTS (SELECT 1 FROM information_schema.columns
+                               WHERE table_name = 'route_geometry_cache' AND column_name = 'coords_json')
+                THEN
+                    ALTER TABLE route_geometry_cache
+                        ADD COLUMN lats DOUBLE PRECISION[],
+                        ADD COLUMN lons DOUBLE PRECISION[];
+                    UPDATE route_geometry_cache SET
+                        lats = ARRAY(
+                            SELECT (p->>0)::float8
+                            FROM jsonb_array_elements(coords_json) WITH ORDINALITY AS t(p, i)
+                            ORDER BY i
+                        ),
+                        lons = ARRAY(
+                            SELECT (p->>1)::float8
+                            FROM jsonb_array_elements(coords_json) WITH ORDINALITY AS t(p, i)
+                            ORDER BY i
+                        );
+                    ALTER TABLE route_geometry_cache
+                        ALTER COLUMN lats SET NOT NULL,
+                        ALTER COLUMN lons SET NOT NULL,
+                        DROP COLUMN coords_json;
+                END IF;
+            END $$
+        """))
 
     # Initialize services
     ettu = EttuClient()
@@ -79,6 +110,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     scheduler.shutdown(wait=False)
     await ettu.close()
+    await tracker.close()
     await broadcaster.close()
     await engine.dispose()
     logger.info("Tram Monitor shut down")
@@ -8,11 +8,12 @@ from sqlalchemy import (
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -117,9 +118,14 @@ class TravelTimeSegment(Base):
 
 class RouteGeometryCache(Base):
     __tablename__ = "route_geometry_cache"
+    __table_args__ = (
+        Index("ix_route_geometry_cache_fetched_at", "fetched_at"),
+    )
 
     route_number: Mapped[str] = mapped_column(String(10), primary_key=True)
-    coords_json: Mapped[list] = mapped_column(JSONB, nullable=False)  # [[lat, lon], ...]
+    # Polyline as parallel coordinate arrays (point i = lats[i], lons[i])
+    lats: Mapped[list[float]] = mapped_column(ARRAY(Float), nullable=False)
+    lons: Mapped[list[float]] = mapped_column(ARRAY(Float), nullable=False)
     fetched_at: Mapped[datetime.datetime] = mapped_column(
         DateTime(timezone=True), nullable=False
     )
@@ -128,8 +134,24 @@ class RouteGeometryCache(Base):
 class DataCacheMeta(Base):
     """Tracks when external data sources were last refreshed."""
     __tablename__ = "data_cache_meta"
+    __table_args__ = (
+        Index("ix_data_cache_meta_refreshed_at", "refreshed_at"),
+    )
 
     cache_key: Mapped[str] = mapped_column(String(50), primary_key=True)
     refreshed_at: Mapped[datetime.datetime] = mapped_column(
         DateTime(timezone=True), nullable=False
     )
+
+
+class EttuResponseCache(Base):
+    """Last ETTU response body per API path, with its HTTP validators."""
+    __tablename__ = "ettu_response_cache"
+
+    path: Mapped[str] = mapped_column(String(100), primary_key=True)
+    etag: Mapped[str] = mapped_column(String(200), nullable=True)
+    last_modified: Mapped[str] = mapped_column(String(100), nullable=True)
+    body: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    fetched_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
@@ -1,4 +1,4 @@
-"""Tests for EtaCalculator (GPS-distance based)."""
+"""Tests for EtaCalculator (distance-along-route based)."""
 
 from app.core.eta_calculator import EtaCalculator
 from app.core.stop_detector import StopOnRoute
@@ -6,16 +6,16 @@ from app.core.stop_detector import StopOnRoute
 
 def test_basic_eta():
     calc = EtaCalculator()
-    # Stop ~500m north of the vehicle (at ~56.84°N, each 0.001° lat ≈ 111m)
+    # Stop 500m ahead of the vehicle along the stop sequence
     stops = [
         StopOnRoute(
             stop_id=1, name="Next", lat=56.8445, lon=60.600,
             order=0, direction=0, cumulative_distance_m=500,
         ),
     ]
-    # Vehicle at (56.840, 60.600), speed 36 km/h = 10 m/s
+    # Vehicle at the start of the sequence, speed 36 km/h = 10 m/s
     results = calc.calculate(
-        vehicle_lat=56.840, vehicle_lon=60.600,
+        distance_along_m=0.0,
         speed_kmh=36, next_stops=stops,
     )
     assert len(results) == 1
@@ -36,10 +36,42 @@ def test_zero_speed_uses_minimum():
     ]
     # Zero speed should use MIN_SPEED_KMH (5 km/h = 1.39 m/s)
     results = calc.calculate(
-        vehicle_lat=56.840, vehicle_lon=60.600,
+        distance_along_m=0.0,
         speed_kmh=0, next_stops=stops,
     )
     assert len(results) == 1
     _, eta = results[0]
     assert eta is not None
     assert eta > 0
+
+
+def test_cumulative_etas_and_cutoff():
+    calc = EtaCalculator()
+    stops = [
+        StopOnRoute(
+            stop_id=i, name=f"S{i}", lat=56.841, lon=60.600,
+            order=i, direction=0, cumulative_distance_m=cum,
+        )
+        for i, cum in enumerate([1000.0, 1500.0, 60000.0])
+    ]
+    # Vehicle 100m before the first stop, 36 km/h = 10 m/s
+    results = calc.calculate(
+        distance_along_m=900.0,
+        speed_kmh=36, next_stops=stops,
+    )
+    etas = [eta for _, eta in results]
+    assert etas[0] == 10
+    assert etas[1] == 60
+    assert etas[2] is None  # beyond MAX_ETA_SECONDS
+
+
+def test_passed_stop_clamps_to_zero():
+    calc = EtaCalculator()
+    stops = [
+        StopOnRoute(
+            stop_id=1, name="Next", lat=56.841, lon=60.600,
+            order=0, direction=0, cumulative_distance_m=100,
+        ),
+    ]
+    results = calc.calculate(distance_along_m=150.0, speed_kmh=36, next_stops=stops)
+    assert results[0][1] == 0
@@ -0,0 +1,174 @@
+"""Tests for ETTU payload parsing helpers."""
+
+import asyncio
+import datetime
+
+import httpx
+import orjson
+
+from app.core.ettu_client import EttuClient, RawRouteStop, _parse_atime
+
+UTC = datetime.timezone.utc
+
+
+def test_parse_atime_converts_to_utc():
+    assert _parse_atime("2026-02-13 16:30:42") == datetime.datetime(2026, 2, 13, 11, 30, 42, tzinfo=UTC)
+
+
+def test_parse_atime_crosses_midnight():
+    assert _parse_atime("2026-03-01 03:00:00") == datetime.datetime(2026, 2, 28, 22, 0, 0, tzinfo=UTC)
+
+
+def test_parse_atime_non_padded_and_invalid():
+    assert _parse_atime("2026-2-3 4:05:06") == datetime.datetime(2026, 2, 2, 23, 5, 6, tzinfo=UTC)
+    assert _parse_atime("") is None
+    assert _parse_atime("2026-13-40 99:99:99") is None
+    assert _parse_atime("garbage") is None
+
+
+def _client_with_payload(payload) -> EttuClient:
+    client = EttuClient()
+    client._client = httpx.AsyncClient(
+        base_url="http://ettu.test",
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json=payload)),
+    )
+    return client
+
+
+def test_fetch_vehicles_schemas():
+    payload = {"vehicles": [
+        {"DEV_ID": 1, "BOARD_NUM": "101", "ROUTE": "5", "LAT": "56.84", "LON": "60.6",
+         "VELOCITY": "20", "COURSE": "90", "ON_ROUTE": "1", "LAYER": "0", "ATIME": "2026-02-13 16:30:42"},
+        # Off-schema record falls back to the alias cascade
+        {"dev_id": 2, "gos_num": "102", "marsh": "7", "lat": 56.85, "lng": 60.61, "speed": 0, "dir": 180},
+        # Dropped: no coordinates
+        {"DEV_ID": 3, "BOARD_NUM": "103", "ROUTE": "5", "LAT": 0, "LON": 0,
+         "VELOCITY": 0, "COURSE": 0, "ON_ROUTE": 1, "LAYER": 0, "ATIME": ""},
+    ]}
+    vehicles = asyncio.run(_client_with_payload(payload).fetch_vehicles())
+    assert [v.dev_id for v in vehicles] == ["1", "2"]
+    v1, v2 = vehicles
+    assert (v1.route_num, v1.lat, v1.speed, v1.on_route, v1.layer) == ("5", 56.84, 20.0, True, 0)
+    assert v1.atime_utc == datetime.datetime(2026, 2, 13, 11, 30, 42, tzinfo=UTC)
+    assert (v2.board_num, v2.route_num, v2.lon, v2.course, v2.layer) == ("102", "7", 60.61, 180.0, -1)
+    assert v2.atime_utc is None
+
+
+def test_fetch_vehicles_field_missing_from_first_record():
+    """A field absent from the first record is still read from later records."""
+    base = {"DEV_ID": 1, "BOARD_NUM": "101", "ROUTE": "5", "LAT": 56.84, "LON": 60.6,
+            "VELOCITY": 20, "ON_ROUTE": 1, "LAYER": 0, "ATIME": ""}
+    payload = {"vehicles": [
+        base,  # no course at all
+        {**base, "DEV_ID": 2, "COURSE": 90},
+        {**base, "DEV_ID": 3, "dir": 180},  # lower-case alias only
+    ]}
+    vehicles = asyncio.run(_client_with_payload(payload).fetch_vehicles())
+    assert [(v.dev_id, v.course) for v in vehicles] == [("1", 0.0), ("2", 90.0), ("3", 180.0)]
+
+
+def test_fetch_stops_schema():
+    payload = [
+        {"ID": 10, "NAME": " Stop A ", "LAT": 56.8, "LON": 60.6, "DIRECTION": "на Центр"},
+        {"ID": 11, "NAME": None, "LAT": 56.9, "LON": 60.7, "DIRECTION": None},
+        {"ID": 0, "NAME": "bad", "LAT": 56.9, "LON": 60.7, "DIRECTION": ""},
+    ]
+    stops = asyncio.run(_client_with_payload(payload).fetch_stops())
+    assert [(s.id, s.name, s.direction) for s in stops] == [(10, "Stop A", "на Центр"), (11, "", "")]
+
+
+def test_fetch_stops_empty_name_falls_through():
+    payload = [
+        {"ID": 10, "NAME": "", "name": "Stop A", "LAT": 56.8, "LON": 60.6, "DIRECTION": "", "direction": "на Центр"},
+        {"ID": 11, "NAME": "Stop B", "name": "other", "LAT": 56.9, "LON": 60.7, "DIRECTION": None},
+    ]
+    stops = asyncio.run(_client_with_payload(payload).fetch_stops())
+    assert [(s.name, s.direction) for s in stops] == [("Stop A", "на Центр"), ("Stop B", "")]
+
+
+def test_fetch_routes_conditional_get():
+    payload = [{"id": 1, "num": "5", "name": "A-B", "elements": [{"full_path": [10, 11]}]}]
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=payload, headers={"ETag": '"v1"'})
+
+    client = EttuClient()
+    client._client = httpx.AsyncClient(base_url="http://ettu.test", transport=httpx.MockTransport(handler))
+
+    async def run():
+        first = await client.fetch_routes()
+        first[0].stops.pop()
+        return first, await client.fetch_routes()
+
+    first, second = asyncio.run(run())
+    assert seen == [None, '"v1"']
+    assert second[0].stops == [RawRouteStop(10, 0, 0), RawRouteStop(11, 1, 0)]
+    assert client.routes_response is None  # nothing new to persist after a 304
+    assert client.routes_not_modified
+
+
+def test_load_routes_primes_conditional_get():
+    payload = [{"id": 1, "num": "5", "name": "A-B", "elements": [{"full_path": [10, 11]}]}]
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        return httpx.Response(304)
+
+    client = EttuClient()
+    client._client = httpx.AsyncClient(base_url="http://ettu.test", transport=httpx.MockTransport(handler))
+
+    async def run():
+        loaded = await client.load_routes(orjson.dumps(payload), '"v1"', None)
+        return loaded, await client.fetch_routes()
+
+    loaded, routes = asyncio.run(run())
+    assert [r.number for r in loaded] == ["5"]
+    assert seen == ['"v1"']
+    assert routes[0].stops == [RawRouteStop(10, 0, 0), RawRouteStop(11, 1, 0)]
+    assert client.routes_not_modified
+
+
+def test_retry_only_server_errors(monkeypatch):
+    async def no_sleep(_):
+        pass
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        status = 503 if len(calls) < 3 else 200
+        if request.url.path.endswith("/points/"):
+            status = 404
+        return httpx.Response(status, json=[])
+
+    client = EttuClient()
+    client._client = httpx.AsyncClient(base_url="http://ettu.test", transport=httpx.MockTransport(handler))
+
+    async def run():
+        ok = await client._get_with_retry("/api/v2/tram/boards/", "vehicles")
+        missing = await client._get_with_retry("/api/v2/tram/points/", "stops")
+        return ok, missing
+
+    ok, missing = asyncio.run(run())
+    assert ok is not None and ok.status_code == 200
+    assert missing is None
+    assert len(calls) == 4  # 2 retried 503s + success, 404 not retried
+
+
+def test_retry_respects_budget():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(503)
+
+    client = EttuClient()
+    client._client = httpx.AsyncClient(base_url="http://ettu.test", transport=httpx.MockTransport(handler))
+    resp = asyncio.run(client._get_with_retry("/api/v2/tram/boards/", "vehicles", budget_s=0.5))
+    assert resp is None
+    assert len(calls) == 1  # the shortest backoff (1s) already exceeds the budget
@@ -1,5 +1,7 @@
 """Tests for RouteMatcher."""
 
+import pytest
+
 from app.core.route_matcher import RouteMatcher
 
 
@@ -36,6 +38,22 @@ def test_no_match_far_from_route():
     assert result is None
 
 
+def test_distance_is_in_meters():
+    """Perpendicular distance uses the latitude scale for north-south offsets."""
+    matcher = RouteMatcher()
+    coords = [
+        [56.8389, 60.5900],
+        [56.8389, 60.6100],
+    ]
+    matcher.load_route(1, coords)
+
+    # 0.001° north of an east-west line ≈ 111m
+    result = matcher.match(1, 56.8399, 60.6000)
+    assert result is not None
+    assert 105 < result.distance_m < 118
+    assert 0.45 < result.progress < 0.55
+
+
 def test_unknown_route():
     """Test matching against an unknown route returns None."""
     matcher = RouteMatcher()
@@ -43,26 +61,80 @@ def test_unknown_route():
     assert result is None
 
 
-def test_line_length():
-    """Test approximate line length calculation."""
+def test_match_with_none_course_does_not_crash():
+    """Route matching should still work if heading is temporarily unknown."""
+    matcher = RouteMatcher()
     coords = [
         [56.8389, 60.5900],
         [56.8389, 60.6000],
     ]
-    length = RouteMatcher._line_length_meters(coords)
-    # ~0.01 degrees of longitude at ~56.8 lat ≈ 610m
-    assert 500 < length < 750
+    matcher.load_route(1, coords)
 
+    result = matcher.match(1, 56.8389, 60.5950, None)
+    assert result is not None
+    assert 0.0 <= result.progress <= 1.0
 
-def test_match_with_none_course_does_not_crash():
-    """Route matching should still work if heading is temporarily unknown."""
+
+def test_direction_from_course():
+    """Heading along the line is forward, heading against it is reverse."""
     matcher = RouteMatcher()
+    # West→east route: bearing ~90°
     coords = [
         [56.8389, 60.5900],
         [56.8389, 60.6000],
+        [56.8389, 60.6100],
     ]
     matcher.load_route(1, coords)
 
-    result = matcher.match(1, 56.8389, 60.5950, None)
-    assert result is not None
-    assert 0.0 <= result.progress <= 1.0
+    assert matcher.match(1, 56.8389, 60.6000, 85.0).direction == 0
+    assert matcher.match(1, 56.8389, 60.6000, 270.0).direction == 1
+
+
+def test_hinted_match_agrees_with_full_scan():
+    """Starting from a segment hint finds the same snap as a full scan."""
+    matcher = RouteMatcher()
+    # 200 short segments heading east
+    coords = [[56.8389, 60.5900 + i * 0.0001] for i in range(201)]
+    matcher.load_route(1, coords)
+
+    full = matcher.match(1, 56.8390, 60.6050)
+    for hint in (0, full.segment - 3, full.segment, 199, 10_000):
+        hinted = matcher.match(1, 56.8390, 60.6050, hint_seg=hint)
+        assert hinted.segment == full.segment
+        assert abs(hinted.progress - full.progress) < 1e-9
+
+
+def test_interpolate_progress_round_trip():
+    """Interpolating a matched progress returns the snapped point."""
+    matcher = RouteMatcher()
+    coords = [
+        [56.8389, 60.5900],
+        [56.8389, 60.6000],
+        [56.8489, 60.6000],
+    ]
+    matcher.load_route(1, coords)
+
+    assert matcher.interpolate_progress(1, 0.0) == pytest.approx((56.8389, 60.5900))
+    assert matcher.interpolate_progress(1, 1.0) == pytest.approx((56.8489, 60.6000))
+
+    result = matcher.match(1, 56.8439, 60.6001)
+    lat, lon = matcher.interpolate_progress(1, result.progress)
+    assert lat == pytest.approx(56.8439, abs=1e-6)
+    assert lon == pytest.approx(60.6000, abs=1e-6)
+
+
+def test_progress_many_matches_match():
+    """Batch snapping agrees with per-point match()."""
+    matcher = RouteMatcher()
+    coords = [[56.8389 + (i % 3) * 0.0004, 60.5900 + i * 0.0007] for i in range(60)]
+    matcher.load_route(1, coords)
+
+    lats = [56.8390, 56.8395, 56.8400, 56.8370]
+    lons = [60.5905, 60.6100, 60.6200, 60.6300]
+    progress, dist_m = matcher.progress_many(1, lats, lons)
+    for lat, lon, prog, dist in zip(lats, lons, progress, dist_m):
+        m = matcher.match(1, lat, lon, None)
+        assert prog == pytest.approx(m.progress)
+        assert dist == pytest.approx(m.distance_m)
+
+    assert matcher.progress_many(999, lats, lons) is None
@@ -1,6 +1,8 @@
 """Tests for StopDetector (GPS-based detection)."""
 
-from app.core.stop_detector import StopDetector, StopOnRoute
+import numpy as np
+
+from app.core.stop_detector import StopDetector, StopOnRoute, _project
 
 
 def make_stops() -> list[StopOnRoute]:
@@ -23,6 +25,10 @@ def test_detect_between_stops():
     assert result.prev_stop.stop_id == 2  # Stop B
     assert len(result.next_stops) > 0
     assert result.next_stops[0].stop_id == 3  # Stop C
+    # Halfway between B and C along the stop sequence
+    b, c = result.prev_stop, result.next_stops[0]
+    midway = (b.cumulative_distance_m + c.cumulative_distance_m) / 2
+    assert abs(result.distance_along_m - midway) < 5
 
 
 def test_detect_at_start():
@@ -138,3 +144,59 @@ def test_terminal_direction_switch():
         # Terminal switch: reverse direction wins with more stops
         assert alt.direction == 1
         assert len(alt.next_stops) >= 2  # At least C', B', A' ahead
+
+
+def test_find_nearest_segment():
+    """Nearest segment is found on the projected per-direction arrays."""
+    detector = StopDetector()
+    detector.load_route_stops(1, make_stops())
+    seq = detector._stops[1][0]
+
+    # Slightly east of the B→C segment
+    idx, dist_sq = StopDetector._find_nearest_segment(seq, _project(56.846, 60.6005))
+    assert idx == 1
+    assert 25 ** 2 < dist_sq < 35 ** 2  # ~30m at this latitude
+
+    # Beyond the last stop snaps to the final segment's endpoint
+    idx, dist_sq = StopDetector._find_nearest_segment(seq, _project(56.853, 60.600))
+    assert idx == 2
+    assert 105 ** 2 < dist_sq < 118 ** 2
+
+
+def test_detect_batch_matches_detect():
+    detector = StopDetector()
+    detector.load_route_stops(1, make_bidirectional_stops())
+
+    lats = np.array([56.840, 56.846, 56.846, 56.8505, 56.852])
+    lons = np.array([60.600, 60.600, 60.6005, 60.6008, 60.600])
+    courses = np.array([np.nan, 0.0, 180.0, 180.0, np.nan])
+    preferred = np.array([-1, 0, 0, -1, 1])
+
+    batch = detector.detect_batch(1, lats, lons, courses, max_next=50, preferred_directions=preferred)
+    for i, got in enumerate(batch):
+        want = detector.detect(
+            1, lats[i], lons[i],
+            None if np.isnan(courses[i]) else courses[i],
+            max_next=50,
+            preferred_direction=None if preferred[i] < 0 else int(preferred[i]),
+        )
+        assert got.direction == want.direction
+        assert got.prev_stop.stop_id == want.prev_stop.stop_id
+        assert [s.stop_id for s in got.next_stops] == [s.stop_id for s in want.next_stops]
+        assert abs(got.distance_along_m - want.distance_along_m) < 1e-6
+
+    assert detector.detect_batch(999, lats, lons)[0].prev_stop is None
+
+
+def test_hinted_detect_agrees_with_full_scan():
+    """A hint_idx window finds the same stop as a full scan, wherever the hint is."""
+    detector = StopDetector()
+    stops = [StopOnRoute(i, f"S{i}", 56.83 + i * 0.001, 60.6, i, 0) for i in range(40)]
+    detector.load_route_stops(1, stops)
+
+    full = detector.detect_in_direction(1, 0, 56.8532, 60.6001, max_next=50)
+    assert full.prev_index == full.prev_stop.order
+    for hint in (0, 10, full.prev_index, 30, 39, 500):
+        hinted = detector.detect_in_direction(1, 0, 56.8532, 60.6001, max_next=50, hint_idx=hint)
+        assert hinted.prev_stop.stop_id == full.prev_stop.stop_id
+        assert hinted.distance_along_m == full.distance_along_m